@@ -1,20 +1,24 @@
 import os
+import hashlib
 import traceback
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 from dataclasses import dataclass, asdict
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 import time
 
+import orjson
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, abort, jsonify, request, send_from_directory
 from flask_cors import CORS
-import snowflake.connector
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from flask_compress import Compress
 import pandas as pd
-from cachetools import TTLCache, cached
+
+from snowflake_service import SnowflakeService, SnowflakeConnectionError, window_settled
 
 # Load environment variables
 load_dotenv()
@@ -58,8 +62,26 @@ from queries.root_cause_pareto import (
     root_cause_pareto_details_sql
 )
 
+# Details query builder per metric, plus the optional filter arg each one accepts
+DETAILS_QUERIES = {
+    'dormant_account_rate': dormant_details_sql,
+    't24h_activation_rate': t24h_details_sql,
+    'involuntary_churn_rate': churn_details_sql,
+    'dunning_recovery_rate': dunning_details_sql,
+    'facebook_cac_to_ltv_ratio': facebook_cac_to_ltv_details_sql,
+    'facebook_lead_ads_total': facebook_lead_ads_details_sql,
+    'platform_breakdown': platform_breakdown_details_sql,
+    'root_cause_pareto': root_cause_pareto_details_sql,
+}
+DETAILS_FILTERS = {
+    'dormant_account_rate': 'dormant',
+    't24h_activation_rate': 'activated',
+}
+# Metrics whose queries read past the window end, so their results never settle
+OPEN_ENDED_METRICS = frozenset({'dormant_account_rate'})
+
 # Data classes for structured responses
-@dataclass
+@dataclass(slots=True)
 class MetricResponse:
     value: Optional[float]
     numerator: int
@@ -70,6 +92,19 @@ class MetricResponse:
     cached: bool = False
     execution_time: Optional[float] = None
 
+    def to_dict(self) -> Dict:
+        """Plain dict of the fields for jsonify"""
+        return {
+            "value": self.value,
+            "numerator": self.numerator,
+            "denominator": self.denominator,
+            "status": self.status,
+            "message": self.message,
+            "data": self.data,
+            "cached": self.cached,
+            "execution_time": self.execution_time
+        }
+
 @dataclass
 class ErrorResponse:
     error: str
@@ -77,135 +112,34 @@ class ErrorResponse:
     details: Optional[str] = None
     timestamp: str = None
 
-class SnowflakeConnectionError(Exception):
-    """Custom exception for Snowflake connection issues"""
-    pass
+def row_value(row: pd.Series, column: str, default=0):
+    """Read a column from a result row, treating missing/NULL as the default (0 stays 0)"""
+    value = row.get(column)
+    return value if pd.notna(value) else default
 
 class MetricsService:
     """Service class for handling metrics calculations with caching and connection pooling"""
     
     def __init__(self):
-        self.conn = None
-        self.last_connection_time = None
-        self.connection_timeout = 300  # 5 minutes
-        self._cache = TTLCache(maxsize=100, ttl=300)  # 5 minute cache
-    
-    def get_connection(self):
-        """Get or create Snowflake connection with connection pooling"""
-        current_time = time.time()
-        
-        # Check if connection is stale or doesn't exist
-        if (self.conn is None or 
-            self.last_connection_time is None or 
-            current_time - self.last_connection_time > self.connection_timeout):
-            
-            if self.conn:
-                try:
-                    self.conn.close()
-                except:
-                    pass
-            
-            self.conn = self._create_connection()
-            self.last_connection_time = current_time
-            logger.info("Created new Snowflake connection")
-        
-        return self.conn
-    
-    def _create_connection(self):
-        """Create a Snowflake connection using PEM key authentication"""
-        try:
-            account = os.getenv('SNOWFLAKE_ACCOUNT', 'TOOOUVG-RHB65714')
-            user = os.getenv('SNOWFLAKE_USER', 'COURSECREATOR360')
-            role = os.getenv('SNOWFLAKE_ROLE', 'SEGMENT_ROLE')
-            warehouse = os.getenv('SNOWFLAKE_WAREHOUSE', 'AUTOMATION_WH')
-            database = os.getenv('SNOWFLAKE_DATABASE', 'SEGMENT_DB')
-            schema = os.getenv('SNOWFLAKE_SCHEMA', 'COURSECREATOR360_WEBSITE_JS_PROD')
-            
-            pem_path = os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH', 'snowflake_private_key.p8')
-            
-            if not os.path.exists(pem_path):
-                # Try .pem extension as fallback
-                pem_path = pem_path.replace('.p8', '.pem')
-                if not os.path.exists(pem_path):
-                    raise FileNotFoundError(f"Private key file not found: {pem_path}")
-            
-            with open(pem_path, 'rb') as key_file:
-                private_key_pem = key_file.read()
-            
-            private_key = load_pem_private_key(private_key_pem, password=None)
-            private_key_der = private_key.private_bytes(
-                encoding=serialization.Encoding.DER,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            )
-            
-            conn = snowflake.connector.connect(
-                account=account,
-                user=user,
-                role=role,
-                warehouse=warehouse,
-                database=database,
-                schema=schema,
-                private_key=private_key_der,
-                insecure_mode=True,
-                autocommit=True,
-                session_parameters={
-                    'QUERY_TAG': 'saas_metrics_dashboard'
-                }
-            )
-            
-            return conn
-            
-        except Exception as e:
-            logger.error(f"Snowflake connection error: {e}")
-            traceback.print_exc()
-            raise SnowflakeConnectionError(f"Failed to connect to Snowflake: {str(e)}")
+        self.snowflake = SnowflakeService()
     
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute a SQL query and return DataFrame with error handling"""
-        conn = self.get_connection()
-        start_time = time.time()
-        
-        try:
-            logger.info(f"Executing query: {query[:100]}...")
-            df = pd.read_sql(query, conn)
-            execution_time = time.time() - start_time
-            logger.info(f"Query executed successfully in {execution_time:.2f}s, returned {len(df)} rows")
-            return df
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"Query execution failed after {execution_time:.2f}s: {e}")
-            raise Exception(f"Query execution failed: {str(e)}")
+    def execute_query(self, query: str, params=None, open_ended: bool = False) -> pd.DataFrame:
+        """Execute a SQL query on a pooled connection and return a DataFrame"""
+        return self.snowflake.execute_query(query, params, open_ended=open_ended)
     
     def clean_dataframe_for_json(self, df: pd.DataFrame) -> List[Dict]:
         """Clean DataFrame to handle NaT, NaN, and other non-serializable values"""
-        if df.empty:
-            return []
-        
-        df_clean = df.where(pd.notnull(df), None)
-        records = []
-        
-        for _, row in df_clean.iterrows():
-            record = {}
-            for col, value in row.items():
-                if pd.isna(value) or value is None:
-                    record[col] = None
-                elif isinstance(value, (pd.Timestamp, datetime)):
-                    record[col] = value.isoformat() if pd.notna(value) else None
-                else:
-                    record[col] = value
-            records.append(record)
-        
-        return records
+        return self.snowflake.clean_dataframe_for_json(df)
     
-    @cached(cache=TTLCache(maxsize=50, ttl=300))
-    def calculate_dormant_account_rate(self, start_dt: datetime, end_dt: datetime) -> MetricResponse:
-        """Calculate dormant account rate with caching"""
+    def _calculate_rate_metric(self, start_dt: datetime, end_dt: datetime, summary_sql,
+                               rate_column: str, numerator_column: str, denominator_column: str,
+                               label: str, message: str, open_ended: bool = False) -> MetricResponse:
+        """Shared body for the single-row rate metrics"""
         start_time = time.time()
         
         try:
-            query = dormant_summary_sql(start_dt, end_dt)
-            df = self.execute_query(query)
+            query, params = summary_sql(start_dt, end_dt)
+            df = self.execute_query(query, params, open_ended)
             
             if df.empty:
                 return MetricResponse(
@@ -213,181 +147,75 @@ class MetricsService:
                     numerator=0,
                     denominator=0,
                     status="ok",
-                    message="No data available for dormant account rate",
-                    cached=True,
+                    message=f"No data available for {label}",
                     execution_time=time.time() - start_time
                 )
             
             row = df.iloc[0]
-            dormant_rate = row.get('DORMANT_RATE') or row.get('dormant_rate') or 0
-            dormant_users = row.get('DORMANT_USERS') or row.get('dormant_users') or 0
-            total_users = row.get('TOTAL_USERS') or row.get('total_users') or 0
+            rate = row_value(row, rate_column)
+            numerator = row_value(row, numerator_column)
+            denominator = row_value(row, denominator_column)
             
             return MetricResponse(
-                value=float(dormant_rate),
-                numerator=int(dormant_users),
-                denominator=int(total_users),
+                value=float(rate),
+                numerator=int(numerator),
+                denominator=int(denominator),
                 status="ok",
-                message=f"{dormant_users} out of {total_users} users became dormant after first purchase",
-                cached=True,
+                message=message.format(numerator=numerator, denominator=denominator),
                 execution_time=time.time() - start_time
             )
         except Exception as e:
-            logger.error(f"Error calculating dormant account rate: {e}")
+            logger.error("Error calculating %s: %s", label, e)
             return MetricResponse(
                 value=None,
                 numerator=0,
                 denominator=0,
                 status="error",
-                message=f"Error calculating dormant account rate: {str(e)}",
+                message=f"Error calculating {label}: {str(e)}",
                 execution_time=time.time() - start_time
             )
     
-    @cached(cache=TTLCache(maxsize=50, ttl=300))
+    def calculate_dormant_account_rate(self, start_dt: datetime, end_dt: datetime) -> MetricResponse:
+        """Calculate dormant account rate"""
+        return self._calculate_rate_metric(
+            start_dt, end_dt, dormant_summary_sql,
+            'dormant_rate', 'dormant_users', 'total_users', "dormant account rate",
+            "{numerator} out of {denominator} users became dormant after first purchase",
+            open_ended='dormant_account_rate' in OPEN_ENDED_METRICS
+        )
+    
     def calculate_activation_rate(self, start_dt: datetime, end_dt: datetime) -> MetricResponse:
-        """Calculate 24h activation rate with caching"""
-        start_time = time.time()
-        
-        try:
-            query = t24h_summary_sql(start_dt, end_dt)
-            df = self.execute_query(query)
-            
-            if df.empty:
-                return MetricResponse(
-                    value=0.0,
-                    numerator=0,
-                    denominator=0,
-                    status="ok",
-                    message="No data available for activation rate",
-                    cached=True,
-                    execution_time=time.time() - start_time
-                )
-            
-            row = df.iloc[0]
-            activation_rate = row.get('ACTIVATION_RATE') or row.get('activation_rate') or 0
-            activated_users = row.get('ACTIVATED_USERS') or row.get('activated_users') or 0
-            total_users = row.get('TOTAL_USERS') or row.get('total_users') or 0
-            
-            return MetricResponse(
-                value=float(activation_rate),
-                numerator=int(activated_users),
-                denominator=int(total_users),
-                status="ok",
-                message=f"{activated_users} out of {total_users} users activated within 24 hours",
-                cached=True,
-                execution_time=time.time() - start_time
-            )
-        except Exception as e:
-            logger.error(f"Error calculating activation rate: {e}")
-            return MetricResponse(
-                value=None,
-                numerator=0,
-                denominator=0,
-                status="error",
-                message=f"Error calculating activation rate: {str(e)}",
-                execution_time=time.time() - start_time
-            )
-
+        """Calculate 24h activation rate"""
+        return self._calculate_rate_metric(
+            start_dt, end_dt, t24h_summary_sql,
+            'activation_rate', 'activated_users', 'total_users', "activation rate",
+            "{numerator} out of {denominator} users activated within 24 hours"
+        )
+    
     def calculate_involuntary_churn_rate(self, start_dt: datetime, end_dt: datetime) -> MetricResponse:
         """Calculate involuntary churn rate"""
-        start_time = time.time()
-        
-        try:
-            query = churn_summary_sql(start_dt, end_dt)
-            df = self.execute_query(query)
-            
-            if df.empty:
-                return MetricResponse(
-                    value=0.0,
-                    numerator=0,
-                    denominator=0,
-                    status="ok",
-                    message="No data available for involuntary churn rate",
-                    execution_time=time.time() - start_time
-                )
-            
-            row = df.iloc[0]
-            churn_rate = row.get('CHURN_RATE') or row.get('churn_rate') or 0
-            churned_users = row.get('CHURNED_USERS') or row.get('churned_users') or 0
-            total_users = row.get('TOTAL_USERS') or row.get('total_users') or 0
-            
-            return MetricResponse(
-                value=float(churn_rate),
-                numerator=int(churned_users),
-                denominator=int(total_users),
-                status="ok",
-                message=f"{churned_users} out of {total_users} users churned due to payment failures",
-                execution_time=time.time() - start_time
-            )
-        except Exception as e:
-            logger.error(f"Error calculating involuntary churn rate: {e}")
-            return MetricResponse(
-                value=None,
-                numerator=0,
-                denominator=0,
-                status="error",
-                message=f"Error calculating involuntary churn rate: {str(e)}",
-                execution_time=time.time() - start_time
-            )
-
+        return self._calculate_rate_metric(
+            start_dt, end_dt, churn_summary_sql,
+            'churn_rate', 'canceled_subscriptions', 'total_cancels', "involuntary churn rate",
+            "{numerator} out of {denominator} users churned due to payment failures"
+        )
+    
     def calculate_dunning_recovery_rate(self, start_dt: datetime, end_dt: datetime) -> MetricResponse:
         """Calculate dunning recovery rate"""
-        start_time = time.time()
-        
-        try:
-            query = dunning_summary_sql(start_dt, end_dt)
-            df = self.execute_query(query)
-            
-            if df.empty:
-                return MetricResponse(
-                    value=0.0,
-                    numerator=0,
-                    denominator=0,
-                    status="ok",
-                    message="No data available for dunning recovery rate",
-                    execution_time=time.time() - start_time
-                )
-            
-            row = df.iloc[0]
-            recovery_rate = row.get('RECOVERY_RATE') or row.get('recovery_rate') or 0
-            recovered_payments = row.get('RECOVERED_PAYMENTS') or row.get('recovered_payments') or 0
-            total_failures = row.get('TOTAL_FAILURES') or row.get('total_failures') or 0
-            
-            return MetricResponse(
-                value=float(recovery_rate),
-                numerator=int(recovered_payments),
-                denominator=int(total_failures),
-                status="ok",
-                message=f"{recovered_payments} out of {total_failures} failed payments were recovered",
-                execution_time=time.time() - start_time
-            )
-        except Exception as e:
-            logger.error(f"Error calculating dunning recovery rate: {e}")
-            return MetricResponse(
-                value=None,
-                numerator=0,
-                denominator=0,
-                status="error",
-                message=f"Error calculating dunning recovery rate: {str(e)}",
-                execution_time=time.time() - start_time
-            )
+        return self._calculate_rate_metric(
+            start_dt, end_dt, dunning_summary_sql,
+            'dunning_recovery_rate', 'recovered', 'failed', "dunning recovery rate",
+            "{numerator} out of {denominator} failed payments were recovered"
+        )
 
     def calculate_facebook_metrics(self, start_dt: datetime, end_dt: datetime) -> Dict[str, MetricResponse]:
         """Calculate Facebook-related metrics"""
         try:
             # Facebook Lead Ads Total
-            lead_ads_query = facebook_lead_ads_summary_sql(start_dt, end_dt)
-            df_leads = self.execute_query(lead_ads_query)
+            lead_ads_query, lead_ads_params = facebook_lead_ads_summary_sql(start_dt, end_dt)
+            df_leads = self.execute_query(lead_ads_query, lead_ads_params)
             
-            # Safely extract total_leads with better error handling
-            total_leads = 0
-            if not df_leads.empty and 'total_leads' in df_leads.columns:
-                total_leads = df_leads.iloc[0]['total_leads']
-            elif not df_leads.empty:
-                # If column name is different, try to get the first numeric column
-                numeric_columns = df_leads.select_dtypes(include=['number']).columns
-                if len(numeric_columns) > 0:
-                    total_leads = df_leads.iloc[0][numeric_columns[0]]
+            total_leads = row_value(df_leads.iloc[0], 'total_leads') if not df_leads.empty else 0
             
             return {
                 'facebook_lead_ads_total': MetricResponse(
@@ -399,7 +227,7 @@ class MetricsService:
                 )
             }
         except Exception as e:
-            logger.error(f"Error calculating Facebook metrics: {e}")
+            logger.error("Error calculating Facebook metrics: %s", e)
             return {
                 'facebook_lead_ads_total': MetricResponse(
                     value=None,
@@ -415,8 +243,8 @@ class MetricsService:
         start_time = time.time()
         
         try:
-            query = platform_breakdown_summary_sql(start_dt, end_dt)
-            df = self.execute_query(query)
+            query, params = platform_breakdown_summary_sql(start_dt, end_dt)
+            df = self.execute_query(query, params)
             data = self.clean_dataframe_for_json(df)
             
             return MetricResponse(
@@ -429,7 +257,7 @@ class MetricsService:
                 execution_time=time.time() - start_time
             )
         except Exception as e:
-            logger.error(f"Error calculating platform breakdown: {e}")
+            logger.error("Error calculating platform breakdown: %s", e)
             return MetricResponse(
                 value=None,
                 numerator=0,
@@ -444,8 +272,8 @@ class MetricsService:
         start_time = time.time()
         
         try:
-            query = root_cause_pareto_summary_sql(start_dt, end_dt)
-            df = self.execute_query(query)
+            query, params = root_cause_pareto_summary_sql(start_dt, end_dt)
+            df = self.execute_query(query, params)
             data = self.clean_dataframe_for_json(df)
             
             return MetricResponse(
@@ -458,7 +286,7 @@ class MetricsService:
                 execution_time=time.time() - start_time
             )
         except Exception as e:
-            logger.error(f"Error calculating root cause Pareto: {e}")
+            logger.error("Error calculating root cause Pareto: %s", e)
             return MetricResponse(
                 value=None,
                 numerator=0,
@@ -468,11 +296,96 @@ class MetricsService:
                 execution_time=time.time() - start_time
             )
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize API responses with orjson (NaN becomes null); keys stay sorted like Flask's default"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+
 # Initialize Flask app and services
 app = Flask(__name__, static_folder='build/static', template_folder='build')
+app.json = OrjsonProvider(app)
 CORS(app)
+
+# gzip/br for JSON and the React bundles; tiny responses are not worth the CPU
+app.config.update(
+    COMPRESS_MIMETYPES=['application/json', 'text/html', 'text/css', 'application/javascript'],
+    COMPRESS_LEVEL=6,
+    COMPRESS_MIN_SIZE=1024,
+)
+Compress(app)
+
+# Webpack bundles under build/static are content-hashed, so browsers can keep them for a year.
+# index.html and the other top-level build files are served with max_age=0 and always revalidated.
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000
+
+# The React build is immutable once deployed, so index it once instead of stat-ing per request
+BUILD_DIR = 'build'
+BUILD_FILES = frozenset(
+    os.path.relpath(os.path.join(root, name), BUILD_DIR).replace(os.sep, '/')
+    for root, _, names in os.walk(BUILD_DIR)
+    for name in names
+)
+
+DASHBOARD_CACHE_TIMEOUT = 300  # 5 minutes
+HISTORICAL_CACHE_TIMEOUT = 24 * 60 * 60  # settled windows no longer change
+
+# Response cache for dashboard metrics (set CACHE_TYPE=RedisCache to share it across workers)
+cache = Cache(app, config={
+    'CACHE_TYPE': os.getenv('CACHE_TYPE', 'SimpleCache'),
+    'CACHE_REDIS_URL': os.getenv('CACHE_REDIS_URL'),
+    'CACHE_DEFAULT_TIMEOUT': DASHBOARD_CACHE_TIMEOUT
+})
+
 metrics_service = MetricsService()
 
+# Concurrent metric queries per dashboard request (bounded by the Snowflake pool size)
+DASHBOARD_MAX_WORKERS = int(os.getenv('DASHBOARD_MAX_WORKERS', 8))
+
+# Shared across requests so threads are not spawned and joined on every dashboard load
+dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_MAX_WORKERS,
+                                        thread_name_prefix='dashboard-metrics')
+
+def dashboard_cache_timeout(end_dt: datetime, open_ended: bool = False) -> int:
+    """Cache settled windows for a day, anything still changing (or open-ended) for 5 minutes"""
+    if not open_ended and window_settled(end_dt):
+        return HISTORICAL_CACHE_TIMEOUT
+    return DASHBOARD_CACHE_TIMEOUT
+
+def dashboard_etag(start_dt: datetime, end_dt: datetime) -> Optional[str]:
+    """ETag for a date window at the current data version (None if it cannot be checked)"""
+    try:
+        version = metrics_service.snowflake.get_data_version()
+    except Exception as e:
+        logger.warning("Could not determine data version: %s", e)
+        return None
+    return hashlib.md5(f"{start_dt.isoformat()}:{end_dt.isoformat()}:{version}".encode()).hexdigest()
+
+def etag_matches(etag: str) -> bool:
+    """If-None-Match check that also accepts the ':gzip'/':br' suffix Flask-Compress appends"""
+    return any(tag.split(':', 1)[0] == etag for tag in request.if_none_match.as_set())
+
+def parse_date_range():
+    """Parse ?start/?end (default: last 30 days), floored to the minute so repeat loads share cache keys"""
+    now = datetime.now()
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    
+    # Defaults are built directly rather than formatted to strings and parsed back
+    try:
+        start_dt = (datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+                    if start_date else now - timedelta(days=30))
+        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00')) if end_date else now
+    except Exception:
+        start_dt = now - timedelta(days=30)
+        end_dt = now
+    
+    return start_dt.replace(second=0, microsecond=0), end_dt.replace(second=0, microsecond=0)
+
 # Error handling decorator
 def handle_errors(f):
     @wraps(f)
@@ -482,7 +395,7 @@ def handle_errors(f):
         except SnowflakeConnectionError as e:
             return jsonify(asdict(ErrorResponse(str(e)))), 500
         except Exception as e:
-            logger.error(f"Unexpected error in {f.__name__}: {e}")
+            logger.error("Unexpected error in %s: %s", f.__name__, e)
             traceback.print_exc()
             return jsonify(asdict(ErrorResponse("Internal server error", details=str(e)))), 500
     return decorated_function
@@ -498,103 +411,108 @@ def health_check():
 @handle_errors
 def dashboard_metrics():
     """Get all dashboard metrics for a date range"""
-    start_date = request.args.get('start', (datetime.now() - timedelta(days=30)).isoformat())
-    end_date = request.args.get('end', datetime.now().isoformat())
+    start_dt, end_dt = parse_date_range()
     
-    # Parse dates
-    try:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    except Exception:
-        start_dt = datetime.now() - timedelta(days=30)
-        end_dt = datetime.now()
+    # Clients re-polling an unchanged window get a 304 without touching Snowflake
+    etag = dashboard_etag(start_dt, end_dt)
+    if etag and etag_matches(etag):
+        not_modified = app.response_class(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
+    
+    # The ETag carries the data version, so a new load never serves a body cached under the old one
+    cache_key = f"dashboard_metrics:{start_dt.isoformat()}:{end_dt.isoformat()}:{etag or ''}"
+    response = cache.get(cache_key)
+    if response is not None:
+        resp = jsonify(response)
+        if etag:
+            resp.set_etag(etag)
+        return resp
+    
+    # Calculate all metrics concurrently - each one is a separate Snowflake round-trip
+    calculations = {
+        # Core metrics
+        'dormant_account_rate': metrics_service.calculate_dormant_account_rate,
+        't24h_activation_rate': metrics_service.calculate_activation_rate,
+        'involuntary_churn_rate': metrics_service.calculate_involuntary_churn_rate,
+        'dunning_recovery_rate': metrics_service.calculate_dunning_recovery_rate,
+        # Additional metrics
+        'platform_breakdown': metrics_service.calculate_platform_breakdown,
+        'root_cause_pareto': metrics_service.calculate_root_cause_pareto,
+    }
     
-    # Calculate all metrics
-    metrics = {}
+    futures = {key: dashboard_executor.submit(func, start_dt, end_dt)
+               for key, func in calculations.items()}
+    # Facebook metrics return a dict of responses
+    facebook_future = dashboard_executor.submit(metrics_service.calculate_facebook_metrics, start_dt, end_dt)
     
-    # Core metrics
-    metrics['dormant_account_rate'] = metrics_service.calculate_dormant_account_rate(start_dt, end_dt)
-    metrics['t24h_activation_rate'] = metrics_service.calculate_activation_rate(start_dt, end_dt)
-    metrics['involuntary_churn_rate'] = metrics_service.calculate_involuntary_churn_rate(start_dt, end_dt)
-    metrics['dunning_recovery_rate'] = metrics_service.calculate_dunning_recovery_rate(start_dt, end_dt)
+    metrics = {key: future.result() for key, future in futures.items()}
+    metrics.update(facebook_future.result())
     
-    # Facebook metrics
-    facebook_metrics = metrics_service.calculate_facebook_metrics(start_dt, end_dt)
-    metrics.update(facebook_metrics)
+    response = {key: metric.to_dict() for key, metric in metrics.items()}
     
-    # Additional metrics
-    metrics['platform_breakdown'] = metrics_service.calculate_platform_breakdown(start_dt, end_dt)
-    metrics['root_cause_pareto'] = metrics_service.calculate_root_cause_pareto(start_dt, end_dt)
+    resp = jsonify(response)
     
-    # Convert to JSON-serializable format
-    response = {}
-    for key, metric in metrics.items():
-        response[key] = asdict(metric)
+    # Only cache complete results so a transient failure is retried on the next request
+    if all(metric['status'] == 'ok' for metric in response.values()):
+        cache.set(cache_key, response, timeout=dashboard_cache_timeout(end_dt, bool(OPEN_ENDED_METRICS)))
+        if etag:
+            resp.set_etag(etag)
     
-    return jsonify(response)
+    return resp
 
 @app.route('/api/metric_details/<metric_name>')
 @handle_errors
 def metric_details(metric_name):
     """Get detailed data for a specific metric"""
-    start_date = request.args.get('start', (datetime.now() - timedelta(days=30)).isoformat())
-    end_date = request.args.get('end', datetime.now().isoformat())
+    start_dt, end_dt = parse_date_range()
     
-    # Parse dates
-    try:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    except Exception:
-        start_dt = datetime.now() - timedelta(days=30)
-        end_dt = datetime.now()
+    details_sql = DETAILS_QUERIES.get(metric_name)
+    if details_sql is None:
+        return jsonify({"error": f"Unknown metric: {metric_name}"}), 400
     
     # Get additional parameters
-    activated = request.args.get('activated')
-    dormant = request.args.get('dormant')
+    filter_arg = DETAILS_FILTERS.get(metric_name)
+    filters = {filter_arg: request.args.get(filter_arg)} if filter_arg else {}
+    
+    # Tile clicks repeat the same (metric, window, filter) combinations
+    cache_key = (f"metric_details:{metric_name}:{start_dt.isoformat()}:{end_dt.isoformat()}:"
+                 f"{sorted(filters.items())}")
+    data = cache.get(cache_key)
+    if data is not None:
+        return jsonify({"data": data, "status": "ok"})
     
     try:
-        if metric_name == 'dormant_account_rate':
-            query = dormant_details_sql(start_dt, end_dt, dormant=dormant == 'true')
-        elif metric_name == 't24h_activation_rate':
-            query = t24h_details_sql(start_dt, end_dt, activated=activated == 'false')
-        elif metric_name == 'involuntary_churn_rate':
-            query = churn_details_sql(start_dt, end_dt)
-        elif metric_name == 'dunning_recovery_rate':
-            query = dunning_details_sql(start_dt, end_dt)
-        elif metric_name == 'facebook_cac_to_ltv_ratio':
-            query = facebook_cac_to_ltv_details_sql(start_dt, end_dt)
-        elif metric_name == 'facebook_lead_ads_total':
-            query = facebook_lead_ads_details_sql(start_dt, end_dt)
-        elif metric_name == 'platform_breakdown':
-            query = platform_breakdown_details_sql(start_dt, end_dt)
-        elif metric_name == 'root_cause_pareto':
-            query = root_cause_pareto_details_sql(start_dt, end_dt)
-        else:
-            return jsonify({"error": f"Unknown metric: {metric_name}"}), 400
-        
-        df = metrics_service.execute_query(query)
-        data = metrics_service.clean_dataframe_for_json(df)
+        query, params = details_sql(start_dt, end_dt, **filters)
+        open_ended = metric_name in OPEN_ENDED_METRICS
+        data = metrics_service.snowflake.execute_query_records(query, params, open_ended=open_ended)
+        cache.set(cache_key, data, timeout=dashboard_cache_timeout(end_dt, open_ended))
         
         return jsonify({"data": data, "status": "ok"})
         
     except Exception as e:
-        logger.error(f"Failed to fetch details for {metric_name}: {e}")
+        logger.error("Failed to fetch details for %s: %s", metric_name, e)
         return jsonify({"error": f"Failed to fetch details for {metric_name}: {str(e)}"}), 500
 
 # Static file serving
 @app.route('/')
 def root():
-    return send_from_directory('build', 'index.html')
+    return send_from_directory(BUILD_DIR, 'index.html', max_age=0)
 
 @app.route('/dashboard')
 def dashboard():
-    return send_from_directory('build', 'index.html')
+    return send_from_directory(BUILD_DIR, 'index.html', max_age=0)
+
+# Unknown API paths are matched by the router itself rather than falling through to the React catch-all
+@app.route('/api/<path:path>')
+def api_not_found(path):
+    return jsonify({"error": "API endpoint not found"}), 404
 
 @app.route('/<path:path>')
 def serve_react(path):
-    if path.startswith('api/'):
-        return jsonify({"error": "API endpoint not found"}), 404
-    return send_from_directory('build', path)
+    if path not in BUILD_FILES:
+        abort(404)
+    return send_from_directory(BUILD_DIR, path, max_age=0)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002, debug=True) 
\ No newline at end of file
@@ -4,18 +4,25 @@ Main application using the new service architecture.
 """
 
 import os
+import hashlib
 import logging
 from datetime import datetime, timedelta
-from dataclasses import asdict
-from functools import wraps
+from functools import lru_cache, wraps
+from typing import Optional
 
+import orjson
+import pyarrow as pa
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, abort, jsonify, request, send_from_directory
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from flask_compress import Compress
 
 from metrics_service import MetricsService
 from metrics_registry import registry
-from snowflake_service import SnowflakeConnectionError
+from queries.pagination import parse_cursor
+from snowflake_service import SnowflakeConnectionError, window_settled
 
 # Load environment variables
 load_dotenv()
@@ -27,14 +34,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize API responses with orjson (NaN becomes null); keys stay sorted like Flask's default"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='build/static', template_folder='build')
+app.json = OrjsonProvider(app)
 CORS(app)
 
+# gzip/br for JSON and the React bundles; tiny responses are not worth the CPU
+app.config.update(
+    COMPRESS_MIMETYPES=['application/json', 'text/html', 'text/css', 'application/javascript'],
+    COMPRESS_LEVEL=6,
+    COMPRESS_MIN_SIZE=1024,
+)
+Compress(app)
+
+# Webpack bundles under build/static are content-hashed, so browsers can keep them for a year.
+# index.html and the other top-level build files are served with max_age=0 and always revalidated.
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000
+
+# The React build is immutable once deployed, so index it once instead of stat-ing per request
+BUILD_DIR = 'build'
+BUILD_FILES = frozenset(
+    os.path.relpath(os.path.join(root, name), BUILD_DIR).replace(os.sep, '/')
+    for root, _, names in os.walk(BUILD_DIR)
+    for name in names
+)
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+DASHBOARD_CACHE_TIMEOUT = 300  # 5 minutes
+HISTORICAL_CACHE_TIMEOUT = 24 * 60 * 60  # settled windows no longer change
+
+# Response cache for dashboard metrics (set CACHE_TYPE=RedisCache to share it across workers)
+cache = Cache(app, config={
+    'CACHE_TYPE': os.getenv('CACHE_TYPE', 'SimpleCache'),
+    'CACHE_REDIS_URL': os.getenv('CACHE_REDIS_URL'),
+    'CACHE_DEFAULT_TIMEOUT': DASHBOARD_CACHE_TIMEOUT
+})
+
 # Initialize services
 metrics_service = MetricsService()
 
 
+def dashboard_cache_timeout(end_dt: datetime, open_ended: bool = False) -> int:
+    """Cache settled windows for a day, anything still changing (or open-ended) for 5 minutes"""
+    if not open_ended and window_settled(end_dt):
+        return HISTORICAL_CACHE_TIMEOUT
+    return DASHBOARD_CACHE_TIMEOUT
+
+
+def dashboard_etag(start_dt: datetime, end_dt: datetime) -> Optional[str]:
+    """ETag for a date window at the current data version (None if it cannot be checked)"""
+    try:
+        version = metrics_service.snowflake.get_data_version()
+    except Exception as e:
+        logger.warning("Could not determine data version: %s", e)
+        return None
+    return hashlib.md5(f"{start_dt.isoformat()}:{end_dt.isoformat()}:{version}".encode()).hexdigest()
+
+
+def etag_matches(etag: str) -> bool:
+    """If-None-Match check that also accepts the ':gzip'/':br' suffix Flask-Compress appends"""
+    return any(tag.split(':', 1)[0] == etag for tag in request.if_none_match.as_set())
+
+
+def parse_date_range():
+    """Parse ?start/?end (default: last 30 days), floored to the minute so repeat loads share cache keys"""
+    now = datetime.now()
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    
+    # Defaults are built directly rather than formatted to strings and parsed back
+    try:
+        start_dt = (datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+                    if start_date else now - timedelta(days=30))
+        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00')) if end_date else now
+    except Exception:
+        start_dt = now - timedelta(days=30)
+        end_dt = now
+    
+    return start_dt.replace(second=0, microsecond=0), end_dt.replace(second=0, microsecond=0)
+
+
+def wants_arrow() -> bool:
+    """Columnar clients opt in with ?format=arrow or an Accept header preferring Arrow IPC"""
+    return (request.args.get('format') == 'arrow'
+            or request.accept_mimetypes.best == ARROW_STREAM_MIMETYPE)
+
+
+def arrow_response(table: pa.Table):
+    """Serialize an Arrow table as an Arrow IPC stream"""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return app.response_class(sink.getvalue().to_pybytes(), mimetype=ARROW_STREAM_MIMETYPE)
+
+
 def handle_errors(f):
     """Error handling decorator"""
     @wraps(f)
@@ -48,7 +154,7 @@ def handle_errors(f):
                 "timestamp": datetime.now().isoformat()
             }), 500
         except Exception as e:
-            logger.error(f"Unexpected error in {f.__name__}: {e}")
+            logger.error("Unexpected error in %s: %s", f.__name__, e)
             return jsonify({
                 "error": "Internal server error",
                 "details": str(e),
@@ -70,7 +176,7 @@ def health_check():
             "metrics_count": len(registry.get_all_metrics())
         })
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         return jsonify({
             "status": "unhealthy",
             "error": str(e),
@@ -82,57 +188,94 @@ def health_check():
 @handle_errors
 def dashboard_metrics():
     """Get all dashboard metrics for a date range"""
-    start_date = request.args.get('start', 
-                                 (datetime.now() - timedelta(days=30)).isoformat())
-    end_date = request.args.get('end', datetime.now().isoformat())
+    start_dt, end_dt = parse_date_range()
     
-    # Parse dates
-    try:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    except Exception:
-        start_dt = datetime.now() - timedelta(days=30)
-        end_dt = datetime.now()
+    # Clients re-polling an unchanged window get a 304 without touching Snowflake
+    etag = dashboard_etag(start_dt, end_dt)
+    if etag and etag_matches(etag):
+        not_modified = app.response_class(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
+    
+    # The ETag carries the data version, so a new load never serves a body cached under the old one
+    cache_key = f"dashboard_metrics:{start_dt.isoformat()}:{end_dt.isoformat()}:{etag or ''}"
+    response = cache.get(cache_key)
+    if response is not None:
+        resp = jsonify(response)
+        if etag:
+            resp.set_etag(etag)
+        return resp
     
     # Calculate all metrics
     metrics = metrics_service.calculate_all_metrics(start_dt, end_dt)
     
-    # Convert to JSON-serializable format
-    response = {}
-    for key, metric in metrics.items():
-        response[key] = asdict(metric)
+    response = {key: metric.to_dict() for key, metric in metrics.items()}
+    
+    resp = jsonify(response)
     
-    return jsonify(response)
+    # Only cache complete results so a transient failure is retried on the next request
+    if all(metric['status'] == 'ok' for metric in response.values()):
+        open_ended = any(config.open_ended for config in registry.get_all_metrics().values())
+        cache.set(cache_key, response, timeout=dashboard_cache_timeout(end_dt, open_ended))
+        if etag:
+            resp.set_etag(etag)
+    
+    return resp
 
 
 @app.route('/api/metric_details/<metric_name>')
 @handle_errors
 def metric_details(metric_name):
     """Get detailed data for a specific metric"""
-    start_date = request.args.get('start', 
-                                 (datetime.now() - timedelta(days=30)).isoformat())
-    end_date = request.args.get('end', datetime.now().isoformat())
-    
-    # Parse dates
-    try:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    except Exception:
-        start_dt = datetime.now() - timedelta(days=30)
-        end_dt = datetime.now()
+    start_dt, end_dt = parse_date_range()
     
     # Get additional parameters
     params = {}
     for key, value in request.args.items():
-        if key not in ['start', 'end']:
+        if key not in ['start', 'end', 'format']:
             params[key] = value
     
+    # Only keyset-paged metrics take a cursor; an empty one means the first page
+    cursor = params.pop('cursor', None)
+    if cursor:
+        config = registry.get_metric(metric_name)
+        if not config or not config.details_cursor_columns:
+            return jsonify({"error": f"Metric {metric_name} does not support cursor pagination"}), 400
+        try:
+            parse_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        params['cursor'] = cursor
+
+    if wants_arrow():
+        result = metrics_service.get_metric_details_arrow(metric_name, start_dt, end_dt, **params)
+        if result is None:
+            return jsonify({"error": f"Unknown metric: {metric_name}"}), 400
+        table, cursor = result
+        resp = arrow_response(table)
+        if cursor:
+            resp.headers['X-Next-Cursor'] = cursor
+        return resp
+    
+    # Tile clicks repeat the same (metric, window, filter) combinations
+    cache_key = (f"metric_details:{metric_name}:{start_dt.isoformat()}:{end_dt.isoformat()}:"
+                 f"{sorted(params.items())}")
+    
     try:
-        data = metrics_service.get_metric_details(metric_name, start_dt, end_dt, **params)
-        return jsonify({"data": data, "status": "ok"})
+        page = cache.get(cache_key)
+        if page is None:
+            data, cursor = metrics_service.get_metric_details_page(metric_name, start_dt, end_dt, **params)
+            page = {"data": data, "next_cursor": cursor}
+            # An empty list may be a swallowed query error, so only keep real rows
+            if data:
+                open_ended = registry.get_metric(metric_name).open_ended
+                cache.set(cache_key, page, timeout=dashboard_cache_timeout(end_dt, open_ended))
+        
+        # Pass ?cursor=<next_cursor> back to fetch the following page
+        return jsonify({**page, "status": "ok"})
         
     except Exception as e:
-        logger.error(f"Failed to fetch details for {metric_name}: {e}")
+        logger.error("Failed to fetch details for %s: %s", metric_name, e)
         return jsonify({
             "error": f"Failed to fetch details for {metric_name}: {str(e)}"
         }), 500
@@ -142,6 +285,12 @@ def metric_details(metric_name):
 @handle_errors
 def metrics_config():
     """Get metrics configuration for frontend"""
+    return app.response_class(metrics_config_json(), mimetype=app.json.mimetype)
+
+
+@lru_cache(maxsize=1)
+def metrics_config_json() -> str:
+    """The registry is fixed once imported, so the frontend config is serialized once per process"""
     configs = registry.get_all_metrics()
     response = {}
     
@@ -159,14 +308,19 @@ def metrics_config():
             "param_options": config.param_options
         }
     
-    return jsonify(response)
+    return app.json.dumps(response)
 
 
 @app.route('/api/categories')
 @handle_errors
 def categories():
     """Get all metric categories"""
-    return jsonify({
+    return app.response_class(categories_json(), mimetype=app.json.mimetype)
+
+
+@lru_cache(maxsize=1)
+def categories_json() -> str:
+    return app.json.dumps({
         "categories": registry.get_categories()
     })
 
@@ -174,24 +328,30 @@ def categories():
 # Static file serving
 @app.route('/')
 def root():
-    return send_from_directory('build', 'index.html')
+    return send_from_directory(BUILD_DIR, 'index.html', max_age=0)
 
 
 @app.route('/dashboard')
 def dashboard():
-    return send_from_directory('build', 'index.html')
+    return send_from_directory(BUILD_DIR, 'index.html', max_age=0)
+
+
+# Unknown API paths are matched by the router itself rather than falling through to the React catch-all
+@app.route('/api/<path:path>')
+def api_not_found(path):
+    return jsonify({"error": "API endpoint not found"}), 404
 
 
 @app.route('/<path:path>')
 def serve_react(path):
-    if path.startswith('api/'):
-        return jsonify({"error": "API endpoint not found"}), 404
-    return send_from_directory('build', path)
+    if path not in BUILD_FILES:
+        abort(404)
+    return send_from_directory(BUILD_DIR, path, max_age=0)
 
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5002))
-    logger.info(f"Starting Flask app on port {port}")
-    logger.info(f"Environment: {os.environ.get('FLASK_ENV', 'development')}")
-    logger.info(f"Debug mode: {os.environ.get('FLASK_DEBUG', 'False')}")
+    logger.info("Starting Flask app on port %s", port)
+    logger.info("Environment: %s", os.environ.get('FLASK_ENV', 'development'))
+    logger.info("Debug mode: %s", os.environ.get('FLASK_DEBUG', 'False'))
     app.run(host='0.0.0.0', port=port, debug=False) 
\ No newline at end of file
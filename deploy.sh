@@ -106,7 +106,7 @@ case $DEPLOY_TARGET in
         fi
         
         # Create Procfile for Heroku
-        echo "web: python app.py" > Procfile
+        echo "web: gunicorn -c gunicorn.conf.py app:app" > Procfile
         
         # Deploy to Heroku
         heroku create saas-metrics-dashboard-$(date +%s) || true
@@ -149,7 +149,7 @@ case $DEPLOY_TARGET in
     "builder": "DOCKERFILE"
   },
   "deploy": {
-    "startCommand": "python app.py",
+    "startCommand": "gunicorn -c gunicorn.conf.py app:app",
     "healthcheckPath": "/api/health",
     "healthcheckTimeout": 300,
     "restartPolicyType": "ON_FAILURE",
@@ -174,7 +174,7 @@ services:
     name: saas-metrics-dashboard
     env: python
     buildCommand: pip install -r requirements.txt
-    startCommand: python app.py
+    startCommand: gunicorn -c gunicorn.conf.py app:app
     envVars:
       - key: FLASK_ENV
         value: production
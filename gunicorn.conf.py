@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration
+Dashboard requests spend nearly all their time waiting on Snowflake, so gevent
+workers let each process keep many requests in flight. The gevent worker
+monkey-patches sockets, threading and time before the app is imported, which
+makes the connector's network reads and the connection pool's locks cooperative.
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = 'gevent'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 100))
+
+# Cold dashboard loads can take a while when the warehouse is resuming
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """Warm Snowflake sessions in the background so the first dashboard load skips login"""
+    import threading
+    from snowflake_service import get_pool
+    
+    def warm():
+        pool = get_pool()
+        try:
+            opened = pool.prefill(int(os.getenv('SNOWFLAKE_POOL_PREFILL', 2)))
+            worker.log.info("Prefilled %d Snowflake connections", opened)
+        except Exception as e:
+            worker.log.warning("Could not prefill Snowflake connection pool: %s", e)
+        # Ping idle sessions before they hit the pool's 5 minute staleness check
+        pool.start_keepalive(int(os.getenv('SNOWFLAKE_KEEPALIVE_INTERVAL', 240)))
+    
+    threading.Thread(target=warm, name='snowflake-warmup', daemon=True).start()
@@ -6,7 +6,8 @@ This makes it easy to add new metrics without touching the main application code
 
 import logging
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, Callable
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Callable, Tuple
 from enum import Enum
 
 logger = logging.getLogger(__name__)
@@ -36,6 +37,8 @@ class MetricConfig:
     cache_ttl: int = 300  # 5 minutes
     requires_params: bool = False
     param_options: Optional[Dict[str, Any]] = None
+    details_cursor_columns: Optional[Tuple[str, str]] = None  # (timestamp, unique key) of keyset-paged details
+    open_ended: bool = False  # queries read past the window end, so results never settle
 
 class MetricsRegistry:
     """Central registry for all metrics"""
@@ -43,28 +46,34 @@ class MetricsRegistry:
     def __init__(self):
         self._metrics: Dict[str, MetricConfig] = {}
         self._categories: set = set()
+        # Maintained at registration so lookups never copy or filter
+        self._by_category: Dict[str, Dict[str, MetricConfig]] = {}
     
     def register_metric(self, config: MetricConfig):
         """Register a new metric"""
+        previous = self._metrics.get(config.key)
+        if previous is not None:
+            self._by_category[previous.category].pop(config.key, None)
         self._metrics[config.key] = config
         self._categories.add(config.category)
-        logger.info(f"Registered metric: {config.key}")
+        self._by_category.setdefault(config.category, {})[config.key] = config
+        logger.info("Registered metric: %s", config.key)
     
     def get_metric(self, key: str) -> Optional[MetricConfig]:
         """Get a metric by key"""
         return self._metrics.get(key)
     
-    def get_all_metrics(self) -> Dict[str, MetricConfig]:
-        """Get all registered metrics"""
-        return self._metrics.copy()
+    def get_all_metrics(self) -> Mapping[str, MetricConfig]:
+        """Get all registered metrics (read-only view)"""
+        return MappingProxyType(self._metrics)
     
     def get_categories(self) -> list:
         """Get all categories"""
         return sorted(list(self._categories))
     
-    def get_metrics_by_category(self, category: str) -> Dict[str, MetricConfig]:
-        """Get all metrics in a category"""
-        return {k: v for k, v in self._metrics.items() if v.category == category}
+    def get_metrics_by_category(self, category: str) -> Mapping[str, MetricConfig]:
+        """Get all metrics in a category (read-only view)"""
+        return MappingProxyType(self._by_category.get(category, {}))
 
 # Global registry instance
 registry = MetricsRegistry()
@@ -99,7 +108,9 @@ def register_all_metrics():
         trend="down",
         trend_value="-2.3%",
         requires_params=True,
-        param_options={"dormant": ["true", "false"]}
+        param_options={"dormant": ["true", "false"]},
+        details_cursor_columns=("first_purchase_date", "user_id"),
+        open_ended=True  # dormancy looks at every event up to now
     ))
     
     registry.register_metric(MetricConfig(
@@ -144,7 +155,8 @@ def register_all_metrics():
         color="bg-green-50 border-green-200 text-green-700",
         icon="AlertTriangle",
         trend="up",
-        trend_value="+5.2%"
+        trend_value="+5.2%",
+        details_cursor_columns=("paid_at", "invoice_id")
     ))
     
     # Marketing Metrics
@@ -173,7 +185,8 @@ def register_all_metrics():
         color="bg-pink-50 border-pink-200 text-pink-700",
         icon="DollarSign",
         trend="up",
-        trend_value="+12%"
+        trend_value="+12%",
+        details_cursor_columns=("timestamp", "user_id")
     ))
     
     # Product & IT Metrics
@@ -5,18 +5,24 @@ Clean, maintainable service for calculating metrics using the registry system.
 
 import time
 import logging
+import threading
 from datetime import datetime
-from typing import Dict, Optional, List
-from dataclasses import dataclass, asdict
-from cachetools import TTLCache, cached
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple
+from dataclasses import dataclass, replace
+from cachetools import TTLCache
 
-from metrics_registry import registry, MetricConfig
+from metrics_registry import registry, MetricConfig, MetricType
 from snowflake_service import SnowflakeService
+from queries.pagination import next_cursor
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class MetricResponse:
     """Standardized response for all metrics"""
     value: Optional[float]
@@ -28,13 +34,41 @@ class MetricResponse:
     cached: bool = False
     execution_time: Optional[float] = None
 
+    def to_dict(self) -> Dict:
+        """Shallow field dict for JSON responses (no asdict() recursion or deep copies)"""
+        return {
+            "value": self.value,
+            "numerator": self.numerator,
+            "denominator": self.denominator,
+            "status": self.status,
+            "message": self.message,
+            "data": self.data,
+            "cached": self.cached,
+            "execution_time": self.execution_time
+        }
+
 
 class MetricsService:
     """Clean service for calculating metrics"""
     
+    # Common column names for different metric types, checked in order
+    VALUE_COLUMNS = {
+        'percentage': ('rate', 'percentage', 'ratio', 'dormant_rate', 'activation_rate'),
+        'ratio': ('ratio', 'cac_to_ltv_ratio', 'value'),
+        'count': ('total', 'count', 'total_leads', 'total_users'),
+        'currency': ('amount', 'revenue', 'spend', 'value')
+    }
+    DEFAULT_VALUE_COLUMNS = ('value', 'total', 'count')
+    NUMERATOR_COLUMNS = ('numerator', 'dormant_users', 'conversions', 'total_leads')
+    DENOMINATOR_COLUMNS = ('denominator', 'total_users', 'total_cancels')
+    BREAKDOWN_COUNT_COLUMNS = ('event_count', 'count')
+    
     def __init__(self):
         self.snowflake = SnowflakeService()
-        self._cache = TTLCache(maxsize=100, ttl=300)  # 5 minute cache
+        # One response cache per metric so each honours its own cache_ttl
+        self._caches = {key: TTLCache(maxsize=100, ttl=config.cache_ttl)
+                        for key, config in registry.get_all_metrics().items()}
+        self._cache_lock = threading.Lock()
     
     def calculate_metric(self, metric_key: str, start_dt: datetime, 
                         end_dt: datetime, **params) -> MetricResponse:
@@ -50,22 +84,29 @@ class MetricsService:
                 message=f"Unknown metric: {metric_key}"
             )
         
+        cache_key = self._response_cache_key(start_dt, end_dt, params)
+        cached_response = self._get_cached(metric_key, cache_key)
+        if cached_response is not None:
+            return cached_response
+        
         start_time = time.time()
         
         try:
             # Execute the summary query
-            query = metric_config.summary_query_func(start_dt, end_dt)
-            df = self.snowflake.execute_query(query)
+            query, query_params = metric_config.summary_query_func(start_dt, end_dt)
+            df = self.snowflake.execute_query(query, query_params, query_tag=metric_key,
+                                              open_ended=metric_config.open_ended)
             
             # Process the results based on metric type
             response = self._process_metric_results(df, metric_config, start_dt, end_dt)
             response.execution_time = time.time() - start_time
+            self._set_cached(metric_key, cache_key, response)
             
-            logger.info(f"Calculated {metric_key} in {response.execution_time:.2f}s")
+            logger.debug("Calculated %s in %.2fs", metric_key, response.execution_time)
             return response
             
         except Exception as e:
-            logger.error(f"Error calculating {metric_key}: {e}")
+            logger.error("Error calculating %s: %s", metric_key, e)
             return MetricResponse(
                 value=None,
                 numerator=0,
@@ -77,16 +118,23 @@ class MetricsService:
     
     def calculate_all_metrics(self, start_dt: datetime, 
                             end_dt: datetime) -> Dict[str, MetricResponse]:
-        """Calculate all registered metrics"""
+        """Calculate all registered metrics, running their summary queries concurrently"""
         
         metrics = {}
+        queries = {}
         all_configs = registry.get_all_metrics()
+        start_time = time.time()
+        cache_key = self._response_cache_key(start_dt, end_dt, {})
         
         for key, config in all_configs.items():
+            cached_response = self._get_cached(key, cache_key)
+            if cached_response is not None:
+                metrics[key] = cached_response
+                continue
             try:
-                metrics[key] = self.calculate_metric(key, start_dt, end_dt)
+                queries[key] = config.summary_query_func(start_dt, end_dt)
             except Exception as e:
-                logger.error(f"Failed to calculate {key}: {e}")
+                logger.error("Failed to build query for %s: %s", key, e)
                 metrics[key] = MetricResponse(
                     value=None,
                     numerator=0,
@@ -95,7 +143,35 @@ class MetricsService:
                     message=f"Failed to calculate {key}: {str(e)}"
                 )
         
-        return metrics
+        try:
+            open_ended = {key for key in queries if all_configs[key].open_ended}
+            results = self.snowflake.execute_queries_async(queries, open_ended=open_ended)
+        except Exception as e:
+            # Connection-level failure: every metric in the batch failed
+            results = {key: e for key in queries}
+        
+        for key, result in results.items():
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                metrics[key] = self._process_metric_results(result, all_configs[key], start_dt, end_dt)
+                metrics[key].execution_time = time.time() - start_time
+                self._set_cached(key, cache_key, metrics[key])
+                logger.debug("Calculated %s: value=%s numerator=%s denominator=%s",
+                             key, metrics[key].value, metrics[key].numerator, metrics[key].denominator)
+            except Exception as e:
+                logger.error("Failed to calculate %s: %s", key, e)
+                metrics[key] = MetricResponse(
+                    value=None,
+                    numerator=0,
+                    denominator=0,
+                    status="error",
+                    message=f"Failed to calculate {key}: {str(e)}",
+                    execution_time=time.time() - start_time
+                )
+        
+        logger.info("Calculated %d metrics in %.2fs", len(metrics), time.time() - start_time)
+        return {key: metrics[key] for key in all_configs if key in metrics}
     
     def get_metric_details(self, metric_key: str, start_dt: datetime, 
                           end_dt: datetime, **params) -> List[Dict]:
@@ -107,14 +183,76 @@ class MetricsService:
         
         try:
             # Execute the details query with parameters
-            query = metric_config.details_query_func(start_dt, end_dt, **params)
-            df = self.snowflake.execute_query(query)
-            return self.snowflake.clean_dataframe_for_json(df)
+            query, query_params = metric_config.details_query_func(start_dt, end_dt, **params)
+            return self.snowflake.execute_query_records(query, query_params,
+                                                        query_tag=f"{metric_key}:details",
+                                                        open_ended=metric_config.open_ended)
             
         except Exception as e:
-            logger.error(f"Error getting details for {metric_key}: {e}")
+            logger.error("Error getting details for %s: %s", metric_key, e)
             return []
     
+    def get_metric_details_page(self, metric_key: str, start_dt: datetime,
+                                end_dt: datetime, **params) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of detailed data and the cursor for the next page (None on the last page)"""
+        
+        metric_config = registry.get_metric(metric_key)
+        if not metric_config or not metric_config.details_query_func:
+            return [], None
+        
+        try:
+            query, query_params = metric_config.details_query_func(start_dt, end_dt, **params)
+            df = self.snowflake.execute_query(query, query_params, query_tag=f"{metric_key}:details",
+                                              open_ended=metric_config.open_ended)
+        except Exception as e:
+            logger.error("Error getting details for %s: %s", metric_key, e)
+            return [], None
+        
+        # Read the cursor from the raw frame - the cleaned records are formatted to whole seconds
+        cursor = None
+        if metric_config.details_cursor_columns and not df.empty:
+            ts_col, key_col = metric_config.details_cursor_columns
+            last = df.iloc[-1]
+            cursor = next_cursor(len(df), last[ts_col], last[key_col])
+        return self.snowflake.clean_dataframe_for_json(df), cursor
+    
+    def get_metric_details_arrow(self, metric_key: str, start_dt: datetime,
+                                 end_dt: datetime, **params) -> Optional[Tuple['pa.Table', Optional[str]]]:
+        """Get detailed data for a metric as an Arrow table plus next-page cursor
+        (None for unknown metrics); errors propagate"""
+        
+        metric_config = registry.get_metric(metric_key)
+        if not metric_config or not metric_config.details_query_func:
+            return None
+        
+        query, query_params = metric_config.details_query_func(start_dt, end_dt, **params)
+        table = self.snowflake.execute_query_arrow(query, query_params, query_tag=f"{metric_key}:details",
+                                                   open_ended=metric_config.open_ended)
+        
+        cursor = None
+        if metric_config.details_cursor_columns and table.num_rows:
+            ts_col, key_col = metric_config.details_cursor_columns
+            cursor = next_cursor(table.num_rows, table.column(ts_col)[-1].as_py(),
+                                 table.column(key_col)[-1].as_py())
+        return table, cursor
+    
+    @staticmethod
+    def _response_cache_key(start_dt: datetime, end_dt: datetime, params: Dict) -> tuple:
+        return (start_dt.isoformat(), end_dt.isoformat(), tuple(sorted(params.items())))
+    
+    def _get_cached(self, metric_key: str, cache_key: tuple) -> Optional[MetricResponse]:
+        """Return a cached response flagged as cached, or None"""
+        with self._cache_lock:
+            response = self._caches[metric_key].get(cache_key) if metric_key in self._caches else None
+        return replace(response, cached=True) if response is not None else None
+    
+    def _set_cached(self, metric_key: str, cache_key: tuple, response: MetricResponse):
+        """Keep successful responses only, so failures are retried on the next call"""
+        if response.status != "ok" or metric_key not in self._caches:
+            return
+        with self._cache_lock:
+            self._caches[metric_key][cache_key] = response
+    
     def _process_metric_results(self, df: 'pd.DataFrame', 
                                config: MetricConfig, 
                                start_dt: datetime, 
@@ -131,8 +269,21 @@ class MetricsService:
                 data=[]
             )
         
-        # Get the first row (summary metrics typically return one row)
-        row = df.iloc[0]
+        # Breakdown metrics are the rows themselves - convert them in one vectorized pass
+        if config.metric_type in (MetricType.LIST, MetricType.PARETO):
+            # The card shows the total count across the breakdown rows
+            count_col = next((c for c in self.BREAKDOWN_COUNT_COLUMNS if c in df.columns), None)
+            return MetricResponse(
+                value=float(df[count_col].sum()) if count_col else None,
+                numerator=0,
+                denominator=0,
+                status="ok",
+                message=config.description,
+                data=self.snowflake.clean_dataframe_for_json(df)
+            )
+        
+        # Get the first row (summary metrics typically return one row) as a plain dict
+        row = df.iloc[0].to_dict()
         
         # Extract values based on common column patterns
         value = self._extract_value(row, config.metric_type.value)
@@ -142,54 +293,37 @@ class MetricsService:
         # Generate message
         message = self._generate_message(config, value, numerator, denominator)
         
-        # Prepare data for list/pareto metrics
-        data = None
-        if config.metric_type.value in ['list', 'pareto'] and len(df) > 1:
-            data = self.snowflake.clean_dataframe_for_json(df)
-        
         return MetricResponse(
             value=value,
             numerator=numerator,
             denominator=denominator,
             status="ok",
-            message=message,
-            data=data
+            message=message
         )
     
-    def _extract_value(self, row, metric_type: str) -> Optional[float]:
-        """Extract the main value from a row based on metric type"""
-        
-        # Common column names for different metric types
-        value_columns = {
-            'percentage': ['rate', 'percentage', 'ratio', 'dormant_rate', 'activation_rate'],
-            'ratio': ['ratio', 'cac_to_ltv_ratio', 'value'],
-            'count': ['total', 'count', 'total_leads', 'total_users'],
-            'currency': ['amount', 'revenue', 'spend', 'value'],
-            'list': ['event_count', 'count'],
-            'pareto': ['count']
-        }
-        
-        columns = value_columns.get(metric_type, ['value', 'total', 'count'])
-        
+    @staticmethod
+    def _first_present(row: Dict, columns: tuple):
+        """First non-null value among columns (v == v is False only for NaN)"""
         for col in columns:
-            if col in row and row[col] is not None:
-                return float(row[col])
-        
+            v = row.get(col)
+            if v is not None and v == v:
+                return v
         return None
     
-    def _extract_numerator(self, row) -> int:
+    def _extract_value(self, row: Dict, metric_type: str) -> Optional[float]:
+        """Extract the main value from a row based on metric type"""
+        v = self._first_present(row, self.VALUE_COLUMNS.get(metric_type, self.DEFAULT_VALUE_COLUMNS))
+        return float(v) if v is not None else None
+    
+    def _extract_numerator(self, row: Dict) -> int:
         """Extract numerator from row"""
-        for col in ['numerator', 'dormant_users', 'conversions', 'total_leads']:
-            if col in row and row[col] is not None:
-                return int(row[col])
-        return 0
+        v = self._first_present(row, self.NUMERATOR_COLUMNS)
+        return int(v) if v is not None else 0
     
-    def _extract_denominator(self, row) -> int:
+    def _extract_denominator(self, row: Dict) -> int:
         """Extract denominator from row"""
-        for col in ['denominator', 'total_users', 'total_cancels']:
-            if col in row and row[col] is not None:
-                return int(row[col])
-        return 0
+        v = self._first_present(row, self.DENOMINATOR_COLUMNS)
+        return int(v) if v is not None else 0
     
     def _generate_message(self, config: MetricConfig, value: Optional[float], 
                          numerator: int, denominator: int) -> str:
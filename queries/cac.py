@@ -1,35 +1,28 @@
-def cac_spend_query(start_date, end_date):
-    """Get total Facebook ad spend for CAC calculation"""
-    return f"""
-    SELECT SUM(i.SPEND) AS total_spend
-    FROM FACEBOOKADS.INSIGHTS i
-    WHERE i.DATE_START >= '{start_date}'
-      AND i.DATE_START <= '{end_date}'
+# Bind parameters: :1 = start date, :2 = end date
+# Spend and trial count share the window, so both come back in one round-trip
+CAC_INPUTS_SQL = """
+    WITH spend AS (
+        SELECT COALESCE(SUM(i.SPEND), 0) AS total_spend
+        FROM FACEBOOKADS.INSIGHTS i
+        WHERE i.DATE_START >= :1
+          AND i.DATE_START <= :2
+    ),
+    trials AS (
+        SELECT COUNT(*) AS total_trials
+        FROM STRIPE.SUBSCRIPTIONS s
+        LEFT JOIN STRIPE.PLANS p ON s.PLAN_ID = p.ID
+        LEFT JOIN STRIPE.PRODUCTS pr ON p.PRODUCT = pr.ID
+        WHERE s.TRIAL_START IS NOT NULL
+          AND s.TRIAL_START >= :1
+          AND s.TRIAL_START <= :2
+          AND pr.NAME ILIKE ANY ('%starter%', '%elite%', '%premium%')
+    )
+    SELECT spend.total_spend, trials.total_trials
+    FROM spend
+    CROSS JOIN trials
     """
 
-
-def cac_trials_query(start_date, end_date):
-    """Get total new Stripe trials for CAC calculation, 
-    including starter/premium/elite plans"""
-    return f"""
-    SELECT COUNT(*) AS total_trials
-    FROM STRIPE.SUBSCRIPTIONS s
-    LEFT JOIN STRIPE.PLANS p ON s.PLAN_ID = p.ID
-    LEFT JOIN STRIPE.PRODUCTS pr ON p.PRODUCT = pr.ID
-    WHERE s.TRIAL_START IS NOT NULL
-      AND s.TRIAL_START >= '{start_date}'
-      AND s.TRIAL_START <= '{end_date}'
-      AND (
-        LOWER(pr.NAME) LIKE '%starter%'
-        OR LOWER(pr.NAME) LIKE '%elite%'
-        OR LOWER(pr.NAME) LIKE '%premium%'
-      )
-    """
-
-
-def included_trials_query(start_date, end_date):
-    """Get all Stripe trials for starter, premium, or elite plans in the date range."""
-    return f"""
+INCLUDED_TRIALS_SQL = """
     SELECT
       s.ID AS subscription_id,
       pr.NAME AS product_name,
@@ -43,15 +36,22 @@ def included_trials_query(start_date, end_date):
       JOIN STRIPE.PRODUCTS pr ON p.PRODUCT = pr.ID
       JOIN STRIPE.CUSTOMERS c ON s.CUSTOMER_ID = c.ID
     WHERE
-      s.TRIAL_START >= '{start_date}'
-      AND s.TRIAL_START <= '{end_date}'
-      AND (
-        LOWER(pr.NAME) LIKE '%starter%'
-        OR LOWER(pr.NAME) LIKE '%elite%'
-        OR LOWER(pr.NAME) LIKE '%premium%'
-      )
+      s.TRIAL_START >= :1
+      AND s.TRIAL_START <= :2
+      AND pr.NAME ILIKE ANY ('%starter%', '%elite%', '%premium%')
     ORDER BY s.TRIAL_START DESC
     """
 
 
+def cac_inputs_query(start_date, end_date):
+    """Get total Facebook ad spend and new Stripe trials (starter/premium/elite
+    plans) for CAC calculation in a single query"""
+    return CAC_INPUTS_SQL, (start_date, end_date)
+
+
+def included_trials_query(start_date, end_date):
+    """Get all Stripe trials for starter, premium, or elite plans in the date range."""
+    return INCLUDED_TRIALS_SQL, (start_date, end_date)
+
+
     # get all stripe with this
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""
+Data Freshness Query
+Latest load time across the schemas the dashboard reads, used to version responses
+"""
+
+# INFORMATION_SCHEMA is metadata only - no warehouse scan
+DATA_FRESHNESS_SQL = """
+    SELECT MAX(LAST_ALTERED) as last_altered
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA IN ('COURSECREATOR360_WEBSITE_JS_PROD', 'FACEBOOKADS', 'FACEBOOK_LEAD_ADS', 'STRIPE')
+    """
+
+
+def data_freshness_sql():
+    """Get the most recent table modification time across source schemas"""
+    return DATA_FRESHNESS_SQL, None
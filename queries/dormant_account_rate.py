@@ -1,51 +1,53 @@
-def summary_sql(start_dt, end_dt):
-    return f"""
-    WITH first_purchases AS (
-        SELECT ANONYMOUS_ID, MIN(ORIGINAL_TIMESTAMP) as first_purchase_date
+from queries.pagination import parse_cursor
+
+# Bind parameters: :1 = start date, :2 = end date (details also :3/:4 = keyset cursor or NULL)
+# One pass over TRACKS per user instead of re-joining every later event to each purchaser.
+# Events before the window cannot follow a purchase inside it, so :1 also bounds the scan.
+USER_DORMANCY_CTE = """
+    WITH user_activity AS (
+        SELECT ANONYMOUS_ID,
+               MIN(CASE WHEN EVENT = 'purchase' AND ORIGINAL_TIMESTAMP <= :2
+                        THEN ORIGINAL_TIMESTAMP END) as first_purchase_date,
+               MAX(ORIGINAL_TIMESTAMP) as last_event_at
         FROM TRACKS
-        WHERE EVENT = 'purchase'
-          AND ORIGINAL_TIMESTAMP >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND ORIGINAL_TIMESTAMP <= '{end_dt.strftime('%Y-%m-%d')}'
+        WHERE ORIGINAL_TIMESTAMP >= :1
         GROUP BY ANONYMOUS_ID
+        HAVING first_purchase_date IS NOT NULL
     ),
     user_sessions_after_purchase AS (
-        SELECT fp.ANONYMOUS_ID, CASE WHEN COUNT(t.ORIGINAL_TIMESTAMP) = 0 THEN 1 ELSE 0 END as is_dormant
-        FROM first_purchases fp
-        LEFT JOIN TRACKS t ON fp.ANONYMOUS_ID = t.ANONYMOUS_ID
-            AND t.ORIGINAL_TIMESTAMP > fp.first_purchase_date
-        GROUP BY fp.ANONYMOUS_ID
+        SELECT ANONYMOUS_ID, first_purchase_date,
+               CASE WHEN last_event_at > first_purchase_date THEN 0 ELSE 1 END as is_dormant
+        FROM user_activity
     )
-    SELECT COUNT(*) as total_users, SUM(is_dormant) as dormant_users,
+"""
+
+SUMMARY_SQL = USER_DORMANCY_CTE + """
+    SELECT COUNT(*) as total_users, COALESCE(SUM(is_dormant), 0) as dormant_users,
            CASE WHEN COUNT(*) > 0 THEN SUM(is_dormant)::FLOAT / COUNT(*)::FLOAT ELSE 0 END as dormant_rate
     FROM user_sessions_after_purchase
     """
 
-def details_sql(start_dt, end_dt, dormant_param=None):
-    filter_clause = ''
-    if dormant_param == 'true':
-        filter_clause = 'WHERE is_dormant = 1'
-    elif dormant_param == 'false':
-        filter_clause = 'WHERE is_dormant = 0'
-    return f"""
-    WITH first_purchases AS (
-        SELECT ANONYMOUS_ID, MIN(ORIGINAL_TIMESTAMP) as first_purchase_date
-        FROM TRACKS
-        WHERE EVENT = 'purchase'
-          AND ORIGINAL_TIMESTAMP >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND ORIGINAL_TIMESTAMP <= '{end_dt.strftime('%Y-%m-%d')}'
-        GROUP BY ANONYMOUS_ID
-    ),
-    user_sessions_after_purchase AS (
-        SELECT fp.ANONYMOUS_ID, fp.first_purchase_date, CASE WHEN COUNT(t.ORIGINAL_TIMESTAMP) = 0 THEN 1 ELSE 0 END as is_dormant
-        FROM first_purchases fp
-        LEFT JOIN TRACKS t ON fp.ANONYMOUS_ID = t.ANONYMOUS_ID
-            AND t.ORIGINAL_TIMESTAMP > fp.first_purchase_date
-        GROUP BY fp.ANONYMOUS_ID, fp.first_purchase_date
-    )
+DETAILS_SQL_TEMPLATE = USER_DORMANCY_CTE + """
     SELECT ANONYMOUS_ID as user_id, first_purchase_date, is_dormant,
            CASE WHEN is_dormant = 1 THEN 'Dormant' ELSE 'Active' END as status
     FROM user_sessions_after_purchase
+    WHERE (:3 IS NULL OR first_purchase_date < :3
+           OR (first_purchase_date = :3 AND ANONYMOUS_ID < :4))
     {filter_clause}
-    ORDER BY first_purchase_date DESC
+    ORDER BY first_purchase_date DESC, ANONYMOUS_ID DESC
     LIMIT 100
-    """ 
\ No newline at end of file
+    """
+
+# One fixed statement per filter value so each variant keeps a stable SQL text
+DETAILS_SQL = {
+    None: DETAILS_SQL_TEMPLATE.format(filter_clause=''),
+    'true': DETAILS_SQL_TEMPLATE.format(filter_clause='AND is_dormant = 1'),
+    'false': DETAILS_SQL_TEMPLATE.format(filter_clause='AND is_dormant = 0'),
+}
+
+def summary_sql(start_dt, end_dt):
+    return SUMMARY_SQL, (start_dt.date(), end_dt.date())
+
+def details_sql(start_dt, end_dt, dormant=None, cursor=None):
+    return (DETAILS_SQL.get(dormant, DETAILS_SQL[None]),
+            (start_dt.date(), end_dt.date(), *parse_cursor(cursor)))
@@ -1,49 +1,52 @@
-def summary_sql(start_dt, end_dt):
-    return f"""
-    WITH failed AS (
-        SELECT ID AS invoice_id, CUSTOMER_ID, MIN(CREATED) AS first_failed
+from queries.pagination import parse_cursor
+
+# Bind parameters: :1 = start date, :2 = end date (details also :3/:4 = keyset cursor or NULL)
+# Failed and recovered invoices, shared by the summary and details queries so both
+# read the same single scan of INVOICES and cannot drift apart.
+DUNNING_BASE_CTE = """
+    WITH invoice_events AS (
+        SELECT ID, CUSTOMER_ID, STATUS, CREATED
         FROM STRIPE.INVOICES
-        WHERE STATUS = 'failed'
-          AND CREATED >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND CREATED <= '{end_dt.strftime('%Y-%m-%d')}'
-        GROUP BY ID, CUSTOMER_ID
+        WHERE STATUS IN ('failed', 'paid')
+          AND CREATED >= :1
+          AND CREATED <= :2
     ),
-    recovered AS (
-        SELECT i.ID AS invoice_id, i.CUSTOMER_ID, i.CREATED as paid_at, c.EMAIL
-        FROM STRIPE.INVOICES i
-        JOIN failed f ON i.ID = f.invoice_id
-        LEFT JOIN STRIPE.CUSTOMERS c ON i.CUSTOMER_ID = c.ID
-        WHERE i.STATUS = 'paid'
-          AND i.CREATED > f.first_failed
-          AND i.CREATED >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND i.CREATED <= '{end_dt.strftime('%Y-%m-%d')}'
-    )
-    SELECT (SELECT COUNT(*) FROM recovered) as recovered, (SELECT COUNT(*) FROM failed) as failed,
-           CASE WHEN (SELECT COUNT(*) FROM failed) > 0 THEN (SELECT COUNT(*) FROM recovered)::FLOAT / (SELECT COUNT(*) FROM failed)::FLOAT ELSE 0 END as dunning_recovery_rate
-    """
-
-def details_sql(start_dt, end_dt):
-    return f"""
-    WITH failed AS (
+    failed AS (
         SELECT ID AS invoice_id, CUSTOMER_ID, MIN(CREATED) AS first_failed
-        FROM STRIPE.INVOICES
+        FROM invoice_events
         WHERE STATUS = 'failed'
-          AND CREATED >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND CREATED <= '{end_dt.strftime('%Y-%m-%d')}'
         GROUP BY ID, CUSTOMER_ID
     ),
     recovered AS (
-        SELECT i.ID AS invoice_id, i.CUSTOMER_ID, i.CREATED as paid_at, c.EMAIL
-        FROM STRIPE.INVOICES i
-        JOIN failed f ON i.ID = f.invoice_id
-        LEFT JOIN STRIPE.CUSTOMERS c ON i.CUSTOMER_ID = c.ID
-        WHERE i.STATUS = 'paid'
-          AND i.CREATED > f.first_failed
-          AND i.CREATED >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND i.CREATED <= '{end_dt.strftime('%Y-%m-%d')}'
+        SELECT e.ID AS invoice_id, e.CUSTOMER_ID, e.CREATED as paid_at
+        FROM invoice_events e
+        JOIN failed f ON e.ID = f.invoice_id
+        WHERE e.STATUS = 'paid'
+          AND e.CREATED > f.first_failed
+    )
+"""
+
+SUMMARY_SQL = DUNNING_BASE_CTE + """
+    , counts AS (
+        SELECT (SELECT COUNT(*) FROM recovered) as recovered, (SELECT COUNT(*) FROM failed) as failed
     )
-    SELECT invoice_id, CUSTOMER_ID, paid_at, EMAIL
-    FROM recovered
-    ORDER BY paid_at DESC
+    SELECT recovered, failed,
+           CASE WHEN failed > 0 THEN recovered::FLOAT / failed::FLOAT ELSE 0 END as dunning_recovery_rate
+    FROM counts
+    """
+
+DETAILS_SQL = DUNNING_BASE_CTE + """
+    SELECT r.invoice_id, r.CUSTOMER_ID, r.paid_at, c.EMAIL
+    FROM recovered r
+    LEFT JOIN STRIPE.CUSTOMERS c ON r.CUSTOMER_ID = c.ID
+    WHERE (:3 IS NULL OR r.paid_at < :3
+           OR (r.paid_at = :3 AND r.invoice_id < :4))
+    ORDER BY r.paid_at DESC, r.invoice_id DESC
     LIMIT 100
-    """ 
\ No newline at end of file
+    """
+
+def summary_sql(start_dt, end_dt):
+    return SUMMARY_SQL, (start_dt.date(), end_dt.date())
+
+def details_sql(start_dt, end_dt, cursor=None):
+    return DETAILS_SQL, (start_dt.date(), end_dt.date(), *parse_cursor(cursor))
@@ -3,88 +3,75 @@ Facebook Metrics Queries
 Handles Facebook CAC to LTV ratio and Facebook Lead Ads calculations
 """
 
-def facebook_cac_to_ltv_summary_sql(start_dt, end_dt):
-    """Calculate Facebook CAC to LTV ratio summary"""
-    return f"""
+from queries.pagination import parse_cursor
+
+# Bind parameters: :1/:2 = ad spend date window, :3/:4 = purchase timestamp window
+FACEBOOK_CAC_TO_LTV_SUMMARY_SQL = """
     WITH facebook_spend AS (
         SELECT SUM(SPEND) as total_spend
         FROM FACEBOOKADS.INSIGHTS
-        WHERE DATE_START >= '{start_dt.date()}'
-        AND DATE_START <= '{end_dt.date()}'
+        WHERE DATE_START >= :1
+        AND DATE_START <= :2
     ),
-    facebook_conversions AS (
-        SELECT COUNT(DISTINCT USER_ID) as conversions
+    -- Conversions and average revenue come from a single scan of PURCHASE
+    purchases AS (
+        SELECT 
+            COUNT(DISTINCT CASE WHEN CONTEXT_CAMPAIGN_SOURCE = 'facebook' THEN USER_ID END) as conversions,
+            AVG(VALUE) as avg_revenue
         FROM COURSECREATOR360_WEBSITE_JS_PROD.PURCHASE
-        WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-        AND TIMESTAMP <= '{end_dt.isoformat()}'
-        AND CONTEXT_CAMPAIGN_SOURCE = 'facebook'
-    ),
-    avg_revenue AS (
-        SELECT AVG(VALUE) as avg_revenue
-        FROM COURSECREATOR360_WEBSITE_JS_PROD.PURCHASE
-        WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-        AND TIMESTAMP <= '{end_dt.isoformat()}'
+        WHERE TIMESTAMP >= :3
+        AND TIMESTAMP <= :4
     )
     SELECT 
         COALESCE(fs.total_spend, 0) as total_spend,
-        COALESCE(fc.conversions, 0) as conversions,
-        COALESCE(ar.avg_revenue, 0) as avg_revenue,
+        COALESCE(p.conversions, 0) as conversions,
+        COALESCE(p.avg_revenue, 0) as avg_revenue,
         CASE 
-            WHEN COALESCE(fc.conversions, 0) > 0 THEN COALESCE(fs.total_spend, 0) / fc.conversions
+            WHEN COALESCE(p.conversions, 0) > 0 THEN COALESCE(fs.total_spend, 0) / p.conversions
             ELSE 0 
         END as cac,
-        COALESCE(ar.avg_revenue, 0) * 12 as ltv,
+        COALESCE(p.avg_revenue, 0) * 12 as ltv,
         CASE 
-            WHEN COALESCE(fc.conversions, 0) > 0 AND COALESCE(fs.total_spend, 0) > 0 
-            THEN (COALESCE(ar.avg_revenue, 0) * 12) / (COALESCE(fs.total_spend, 0) / fc.conversions)
+            WHEN COALESCE(p.conversions, 0) > 0 AND COALESCE(fs.total_spend, 0) > 0 
+            THEN (COALESCE(p.avg_revenue, 0) * 12) / (COALESCE(fs.total_spend, 0) / p.conversions)
             ELSE 0 
         END as cac_to_ltv_ratio
     FROM facebook_spend fs
-    CROSS JOIN facebook_conversions fc
-    CROSS JOIN avg_revenue ar
+    CROSS JOIN purchases p
     """
 
-def facebook_cac_to_ltv_details_sql(start_dt, end_dt):
-    """Get detailed Facebook CAC to LTV breakdown"""
-    return f"""
+FACEBOOK_CAC_TO_LTV_DETAILS_SQL = """
+    WITH purchases AS (
+        SELECT 
+            COUNT(DISTINCT CASE WHEN CONTEXT_CAMPAIGN_SOURCE = 'facebook' THEN USER_ID END) as conversions,
+            AVG(VALUE) as avg_revenue
+        FROM COURSECREATOR360_WEBSITE_JS_PROD.PURCHASE
+        WHERE TIMESTAMP >= :3
+        AND TIMESTAMP <= :4
+    )
     SELECT 
         'Facebook Ad Spend' as metric_type,
-        SUM(SPEND) as value,
+        COALESCE(SUM(SPEND), 0) as value,
         'USD' as unit
     FROM FACEBOOKADS.INSIGHTS
-    WHERE DATE_START >= '{start_dt.date()}'
-    AND DATE_START <= '{end_dt.date()}'
+    WHERE DATE_START >= :1
+    AND DATE_START <= :2
     UNION ALL
-    SELECT 
-        'Facebook Conversions' as metric_type,
-        COUNT(DISTINCT USER_ID) as value,
-        'users' as unit
-    FROM COURSECREATOR360_WEBSITE_JS_PROD.PURCHASE
-    WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-    AND TIMESTAMP <= '{end_dt.isoformat()}'
-    AND CONTEXT_CAMPAIGN_SOURCE = 'facebook'
+    SELECT 'Facebook Conversions' as metric_type, conversions as value, 'users' as unit
+    FROM purchases
     UNION ALL
-    SELECT 
-        'Average Revenue' as metric_type,
-        AVG(VALUE) as value,
-        'USD' as unit
-    FROM COURSECREATOR360_WEBSITE_JS_PROD.PURCHASE
-    WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-    AND TIMESTAMP <= '{end_dt.isoformat()}'
+    SELECT 'Average Revenue' as metric_type, COALESCE(avg_revenue, 0) as value, 'USD' as unit
+    FROM purchases
     """
 
-def facebook_lead_ads_summary_sql(start_dt, end_dt):
-    """Calculate Facebook Lead Ads total"""
-    return f"""
+FACEBOOK_LEAD_ADS_SUMMARY_SQL = """
     SELECT COUNT(*) as total_leads
     FROM FACEBOOK_LEAD_ADS.IDENTIFIES
-    WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-    AND TIMESTAMP <= '{end_dt.isoformat()}'
+    WHERE TIMESTAMP >= :1
+    AND TIMESTAMP <= :2
     """
 
-def facebook_lead_ads_details_sql(start_dt, end_dt):
-    """Get detailed Facebook Lead Ads data"""
-    return f"""
+FACEBOOK_LEAD_ADS_DETAILS_SQL = """
     SELECT 
         ID as user_id,
         TIMESTAMP,
@@ -94,8 +81,27 @@ def facebook_lead_ads_details_sql(start_dt, end_dt):
         NAME as name,
         PHONE_NUMBER as phone
     FROM FACEBOOK_LEAD_ADS.IDENTIFIES
-    WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-    AND TIMESTAMP <= '{end_dt.isoformat()}'
-    ORDER BY TIMESTAMP DESC
+    WHERE TIMESTAMP >= :1
+    AND TIMESTAMP <= :2
+    AND (:3 IS NULL OR TIMESTAMP < :3
+         OR (TIMESTAMP = :3 AND ID < :4))
+    ORDER BY TIMESTAMP DESC, ID DESC
     LIMIT 100
-    """ 
\ No newline at end of file
+    """
+
+
+def facebook_cac_to_ltv_summary_sql(start_dt, end_dt):
+    """Calculate Facebook CAC to LTV ratio summary"""
+    return FACEBOOK_CAC_TO_LTV_SUMMARY_SQL, (start_dt.date(), end_dt.date(), start_dt, end_dt)
+
+def facebook_cac_to_ltv_details_sql(start_dt, end_dt):
+    """Get detailed Facebook CAC to LTV breakdown"""
+    return FACEBOOK_CAC_TO_LTV_DETAILS_SQL, (start_dt.date(), end_dt.date(), start_dt, end_dt)
+
+def facebook_lead_ads_summary_sql(start_dt, end_dt):
+    """Calculate Facebook Lead Ads total"""
+    return FACEBOOK_LEAD_ADS_SUMMARY_SQL, (start_dt, end_dt)
+
+def facebook_lead_ads_details_sql(start_dt, end_dt, cursor=None):
+    """Get detailed Facebook Lead Ads data, one page older than cursor"""
+    return FACEBOOK_LEAD_ADS_DETAILS_SQL, (start_dt, end_dt, *parse_cursor(cursor)) 
\ No newline at end of file
@@ -10,7 +10,10 @@ def facebook_subscription_analysis_query():
             PHONE_NUMBER,
             USER_PROVIDED_PHONE_NUMBER,
             ANONYMOUS_ID,
-            TIMESTAMP
+            TIMESTAMP,
+            -- Normalized once here so the join below compares plain columns
+            LOWER(EMAIL) AS email_key,
+            LOWER(USER_PROVIDED_PHONE_NUMBER) AS phone_key
         FROM FACEBOOK_LEAD_ADS.IDENTIFIES
         WHERE TIMESTAMP >= DATEADD(DAY, -30, CURRENT_TIMESTAMP())
           AND (
@@ -27,6 +30,7 @@ def facebook_subscription_analysis_query():
             s.CREATED,
             s.STATUS,
             c.EMAIL AS customer_email,
+            LOWER(c.EMAIL) AS email_key,
             c.DESCRIPTION AS customer_name,
             pr.NAME AS product_name,
             p.AMOUNT,
@@ -36,11 +40,7 @@ def facebook_subscription_analysis_query():
         JOIN STRIPE.PLANS p ON s.PLAN_ID = p.ID
         JOIN STRIPE.PRODUCTS pr ON p.PRODUCT = pr.ID
         WHERE s.CREATED >= DATEADD(DAY, -30, CURRENT_TIMESTAMP())
-          AND (
-            LOWER(pr.NAME) LIKE '%starter%'
-            OR LOWER(pr.NAME) LIKE '%elite%'
-            OR LOWER(pr.NAME) LIKE '%premium%'
-          )
+          AND pr.NAME ILIKE ANY ('%starter%', '%elite%', '%premium%')
     ),
     facebook_attributed AS (
         -- Match Facebook leads with Stripe subscriptions
@@ -55,8 +55,8 @@ def facebook_subscription_analysis_query():
             COALESCE(fl.PHONE_NUMBER, fl.USER_PROVIDED_PHONE_NUMBER) AS facebook_phone
         FROM stripe_subscriptions ss
         LEFT JOIN facebook_leads fl ON (
-            LOWER(ss.customer_email) = LOWER(fl.EMAIL)
-            OR LOWER(ss.customer_email) = LOWER(fl.USER_PROVIDED_PHONE_NUMBER)
+            ss.email_key = fl.email_key
+            OR ss.email_key = fl.phone_key
         )
     )
     SELECT
@@ -90,7 +90,10 @@ def facebook_subscription_summary_query():
             PHONE_NUMBER,
             USER_PROVIDED_PHONE_NUMBER,
             ANONYMOUS_ID,
-            TIMESTAMP
+            TIMESTAMP,
+            -- Normalized once here so the join below compares plain columns
+            LOWER(EMAIL) AS email_key,
+            LOWER(USER_PROVIDED_PHONE_NUMBER) AS phone_key
         FROM FACEBOOK_LEAD_ADS.IDENTIFIES
         WHERE TIMESTAMP >= DATEADD(DAY, -30, CURRENT_TIMESTAMP())
           AND (
@@ -100,38 +103,34 @@ def facebook_subscription_summary_query():
           )
     ),
     stripe_subscriptions AS (
+        -- Only the join key is needed for the counts below
         SELECT
             s.ID AS subscription_id,
-            s.CUSTOMER_ID,
-            s.CREATED,
-            s.STATUS,
-            c.EMAIL AS customer_email,
-            c.DESCRIPTION AS customer_name,
-            pr.NAME AS product_name
+            LOWER(c.EMAIL) AS email_key
         FROM STRIPE.SUBSCRIPTIONS s
         JOIN STRIPE.CUSTOMERS c ON s.CUSTOMER_ID = c.ID
         JOIN STRIPE.PLANS p ON s.PLAN_ID = p.ID
         JOIN STRIPE.PRODUCTS pr ON p.PRODUCT = pr.ID
         WHERE s.CREATED >= DATEADD(DAY, -30, CURRENT_TIMESTAMP())
-          AND (
-            LOWER(pr.NAME) LIKE '%starter%'
-            OR LOWER(pr.NAME) LIKE '%elite%'
-            OR LOWER(pr.NAME) LIKE '%premium%'
-          )
+          AND pr.NAME ILIKE ANY ('%starter%', '%elite%', '%premium%')
+    ),
+    lead_keys AS (
+        -- Distinct match keys, so the join below is a single equality semi-join
+        -- and a customer with several lead rows is still counted once
+        SELECT email_key AS lead_key FROM facebook_leads WHERE email_key IS NOT NULL
+        UNION
+        SELECT phone_key FROM facebook_leads WHERE phone_key IS NOT NULL
     ),
     attribution_analysis AS (
         SELECT
-            ss.*,
+            ss.subscription_id,
             CASE 
-                WHEN fl.EMAIL IS NOT NULL OR fl.PHONE_NUMBER IS NOT NULL OR fl.USER_PROVIDED_PHONE_NUMBER IS NOT NULL 
+                WHEN lk.lead_key IS NOT NULL
                 THEN 'Facebook Lead Ad'
                 ELSE 'Other Source'
             END AS attribution_source
         FROM stripe_subscriptions ss
-        LEFT JOIN facebook_leads fl ON (
-            LOWER(ss.customer_email) = LOWER(fl.EMAIL)
-            OR LOWER(ss.customer_email) = LOWER(fl.USER_PROVIDED_PHONE_NUMBER)
-        )
+        LEFT JOIN lead_keys lk ON ss.email_key = lk.lead_key
     )
     SELECT
         COUNT(*) AS total_subscriptions,
@@ -1,5 +1,5 @@
-def summary_sql(start_dt, end_dt):
-    return f"""
+# Bind parameters: :1 = start date, :2 = end date
+SUMMARY_SQL = """
     SELECT COUNT(*) as total_cancels,
            COUNT(CASE WHEN s.STATUS = 'canceled'
                       AND s.CANCELED_AT IS NOT NULL THEN 1 END)
@@ -11,21 +11,32 @@ def summary_sql(start_dt, end_dt):
                 ELSE 0 END as churn_rate
     FROM STRIPE.SUBSCRIPTIONS s
     WHERE s.STATUS = 'canceled'
-      AND s.CANCELED_AT >= '{start_dt.strftime('%Y-%m-%d')}'
-      AND s.CANCELED_AT <= '{end_dt.strftime('%Y-%m-%d')}'
+      AND s.CANCELED_AT >= :1
+      AND s.CANCELED_AT <= :2
     """
 
-def details_sql(start_dt, end_dt):
-    return f"""
-    SELECT s.CUSTOMER_ID as customer_id,
-           s.CANCELED_AT as canceled_at,
+# Take the 100 latest cancellations first so CUSTOMERS is only probed for those IDs
+DETAILS_SQL = """
+    WITH cancels AS (
+        SELECT s.CUSTOMER_ID, s.CANCELED_AT
+        FROM STRIPE.SUBSCRIPTIONS s
+        WHERE s.STATUS = 'canceled'
+          AND s.CANCELED_AT >= :1
+          AND s.CANCELED_AT <= :2
+        ORDER BY s.CANCELED_AT DESC
+        LIMIT 100
+    )
+    SELECT cn.CUSTOMER_ID as customer_id,
+           cn.CANCELED_AT as canceled_at,
            c.EMAIL as email
-    FROM STRIPE.SUBSCRIPTIONS s
+    FROM cancels cn
     LEFT JOIN STRIPE.CUSTOMERS c
-      ON s.CUSTOMER_ID = c.ID
-    WHERE s.STATUS = 'canceled'
-      AND s.CANCELED_AT >= '{start_dt.strftime('%Y-%m-%d')}'
-      AND s.CANCELED_AT <= '{end_dt.strftime('%Y-%m-%d')}'
-    ORDER BY s.CANCELED_AT DESC
-    LIMIT 100
-    """ 
\ No newline at end of file
+      ON cn.CUSTOMER_ID = c.ID
+    ORDER BY cn.CANCELED_AT DESC
+    """
+
+def summary_sql(start_dt, end_dt):
+    return SUMMARY_SQL, (start_dt.date(), end_dt.date())
+
+def details_sql(start_dt, end_dt):
+    return DETAILS_SQL, (start_dt.date(), end_dt.date())
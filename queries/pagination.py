@@ -0,0 +1,31 @@
+"""
+Keyset pagination helpers for details queries.
+Pages are ordered newest first by (timestamp, unique key); the cursor is that pair
+for the last row already shown, and the next page is every row that sorts after it.
+Ties on the timestamp are broken by the key, so no row is skipped at a page boundary.
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+DETAILS_PAGE_SIZE = 100  # keep in step with the LIMIT in the paged details SQL
+
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[Optional[datetime], Optional[str]]:
+    """Split a cursor from the query string into (timestamp, key) binds; (None, None) for the first page.
+    Raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None, None
+    ts_text, sep, key = cursor.partition('|')
+    if not sep or not key:
+        raise ValueError(f"Malformed cursor: {cursor!r}")
+    return datetime.fromisoformat(ts_text.replace('Z', '+00:00')), key
+
+
+def next_cursor(row_count: int, last_ts, last_key) -> Optional[str]:
+    """Cursor for the page after a result, or None when it was the last page.
+    last_ts must be the raw fetched value, not a formatted one, so sub-second precision survives."""
+    # last_ts != last_ts is only true for NaT/NaN
+    if row_count < DETAILS_PAGE_SIZE or last_ts is None or last_ts != last_ts:
+        return None
+    return f"{last_ts.isoformat()}|{last_key}"
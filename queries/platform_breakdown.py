@@ -3,36 +3,128 @@ Platform Breakdown Queries
 Handles platform analysis and device type breakdowns
 """
 
+import os
 
-def platform_breakdown_summary_sql(start_dt, end_dt):
-    """Calculate platform breakdown summary"""
-    return f"""
+# Read the daily rollup (sql/page_view_platform_daily.sql) instead of raw page views
+USE_ROLLUP = os.getenv('USE_PAGE_VIEW_ROLLUP', 'false').lower() == 'true'
+
+# unique_users is a HyperLogLog estimate on both paths, so toggling the rollup does not shift it
+PLATFORM_BREAKDOWN_SUMMARY_SQL = """
     SELECT 
         CONTEXT_USER_AGENT_DATA_PLATFORM as platform,
         COUNT(*) as event_count,
-        COUNT(DISTINCT USER_ID) as unique_users
+        APPROX_COUNT_DISTINCT(USER_ID) as unique_users
     FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW
-    WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-    AND TIMESTAMP <= '{end_dt.isoformat()}'
+    WHERE TIMESTAMP >= :1
+    AND TIMESTAMP <= :2
     AND CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
     GROUP BY CONTEXT_USER_AGENT_DATA_PLATFORM
     ORDER BY event_count DESC
     LIMIT 5
     """
 
+# Details keep only the days of the same top 5 platforms the summary shows
+TOP_PLATFORMS_SQL = """
+    ranked AS (
+        SELECT d.platform, d.event_count, d.unique_users, d.date,
+               SUM(d.event_count) OVER (PARTITION BY d.platform) as platform_total
+        FROM detail_rows d
+    )
+    SELECT platform, event_count, unique_users, date
+    FROM ranked
+    QUALIFY DENSE_RANK() OVER (ORDER BY platform_total DESC, platform) <= 5
+    ORDER BY event_count DESC
+    LIMIT 500
+    """
 
-def platform_breakdown_details_sql(start_dt, end_dt):
-    """Get detailed platform breakdown data"""
-    return f"""
+PLATFORM_BREAKDOWN_DETAILS_SQL = """
+    WITH detail_rows AS (
+        SELECT 
+            CONTEXT_USER_AGENT_DATA_PLATFORM as platform,
+            COUNT(*) as event_count,
+            APPROX_COUNT_DISTINCT(USER_ID) as unique_users,
+            DATE(TIMESTAMP) as date
+        FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW
+        WHERE TIMESTAMP >= :1
+        AND TIMESTAMP <= :2
+        AND CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
+        GROUP BY CONTEXT_USER_AGENT_DATA_PLATFORM, DATE(TIMESTAMP)
+    ),""" + TOP_PLATFORMS_SQL
+
+# The rollup only serves whole days inside [:1, :2] that the nightly task has rolled up,
+# [day_from, day_to). Partial boundary days and days not rolled up yet (normally just
+# today) are read live, so both paths count exactly the same page views.
+ROLLUP_RANGE_CTE = """
+    rollup_range AS (
+        SELECT IFF(DATE_TRUNC('DAY', :1) = :1, DATE(:1), DATEADD(DAY, 1, DATE(:1))) AS day_from,
+               LEAST(DATE(:2), COALESCE(DATEADD(DAY, 1, MAX(DAY)), '1970-01-01'::DATE)) AS day_to
+        FROM PUBLIC.PAGE_VIEW_PLATFORM_DAILY
+    )"""
+
+PLATFORM_BREAKDOWN_ROLLUP_SUMMARY_SQL = f"""
+    WITH {ROLLUP_RANGE_CTE.strip()},
+    daily AS (
+        SELECT PLATFORM, EVENT_COUNT, USERS_HLL
+        FROM PUBLIC.PAGE_VIEW_PLATFORM_DAILY, rollup_range
+        WHERE DAY >= rollup_range.day_from
+        AND DAY < rollup_range.day_to
+        UNION ALL
+        SELECT 
+            CONTEXT_USER_AGENT_DATA_PLATFORM,
+            COUNT(*),
+            HLL_ACCUMULATE(USER_ID)
+        FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW, rollup_range
+        WHERE TIMESTAMP >= :1
+        AND TIMESTAMP <= :2
+        AND (TIMESTAMP < rollup_range.day_from OR TIMESTAMP >= rollup_range.day_to)
+        AND CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
+        GROUP BY CONTEXT_USER_AGENT_DATA_PLATFORM
+    )
     SELECT 
-        CONTEXT_USER_AGENT_DATA_PLATFORM as platform,
-        COUNT(*) as event_count,
-        COUNT(DISTINCT USER_ID) as unique_users,
-        DATE(TIMESTAMP) as date
-    FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW
-    WHERE TIMESTAMP >= '{start_dt.isoformat()}'
-    AND TIMESTAMP <= '{end_dt.isoformat()}'
-    AND CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
-    GROUP BY CONTEXT_USER_AGENT_DATA_PLATFORM, DATE(TIMESTAMP)
+        PLATFORM as platform,
+        SUM(EVENT_COUNT) as event_count,
+        HLL_ESTIMATE(HLL_COMBINE(USERS_HLL)) as unique_users
+    FROM daily
+    GROUP BY PLATFORM
     ORDER BY event_count DESC
-    """ 
\ No newline at end of file
+    LIMIT 5
+    """
+
+PLATFORM_BREAKDOWN_ROLLUP_DETAILS_SQL = f"""
+    WITH {ROLLUP_RANGE_CTE.strip()},
+    detail_rows AS (
+        SELECT 
+            PLATFORM as platform,
+            EVENT_COUNT as event_count,
+            HLL_ESTIMATE(USERS_HLL) as unique_users,
+            DAY as date
+        FROM PUBLIC.PAGE_VIEW_PLATFORM_DAILY, rollup_range
+        WHERE DAY >= rollup_range.day_from
+        AND DAY < rollup_range.day_to
+        UNION ALL
+        SELECT 
+            CONTEXT_USER_AGENT_DATA_PLATFORM as platform,
+            COUNT(*) as event_count,
+            HLL(USER_ID) as unique_users,
+            DATE(TIMESTAMP) as date
+        FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW, rollup_range
+        WHERE TIMESTAMP >= :1
+        AND TIMESTAMP <= :2
+        AND (TIMESTAMP < rollup_range.day_from OR TIMESTAMP >= rollup_range.day_to)
+        AND CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
+        GROUP BY CONTEXT_USER_AGENT_DATA_PLATFORM, DATE(TIMESTAMP)
+    ),""" + TOP_PLATFORMS_SQL
+
+
+def platform_breakdown_summary_sql(start_dt, end_dt):
+    """Calculate platform breakdown summary"""
+    if USE_ROLLUP:
+        return PLATFORM_BREAKDOWN_ROLLUP_SUMMARY_SQL, (start_dt, end_dt)
+    return PLATFORM_BREAKDOWN_SUMMARY_SQL, (start_dt, end_dt)
+
+
+def platform_breakdown_details_sql(start_dt, end_dt):
+    """Get detailed platform breakdown data"""
+    if USE_ROLLUP:
+        return PLATFORM_BREAKDOWN_ROLLUP_DETAILS_SQL, (start_dt, end_dt)
+    return PLATFORM_BREAKDOWN_DETAILS_SQL, (start_dt, end_dt) 
\ No newline at end of file
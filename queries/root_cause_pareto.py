@@ -3,16 +3,18 @@ Root Cause Pareto Analysis Queries
 Handles payment failure analysis and Pareto charts
 """
 
+import os
 
-def root_cause_pareto_summary_sql(start_dt, end_dt):
-    """Calculate root cause Pareto summary"""
-    return f"""
+# Read the daily rollup (sql/charge_failures_daily.sql) instead of raw charges
+USE_ROLLUP = os.getenv('USE_CHARGE_FAILURE_ROLLUP', 'false').lower() == 'true'
+
+ROOT_CAUSE_PARETO_SUMMARY_SQL = """
     SELECT 
         FAILURE_CODE as reason,
         COUNT(*) as count
     FROM STRIPE.CHARGES
-    WHERE CREATED >= '{start_dt.isoformat()}'
-    AND CREATED <= '{end_dt.isoformat()}'
+    WHERE CREATED >= :1
+    AND CREATED <= :2
     AND STATUS = 'failed'
     AND FAILURE_CODE IS NOT NULL
     GROUP BY FAILURE_CODE
@@ -20,19 +22,106 @@ def root_cause_pareto_summary_sql(start_dt, end_dt):
     LIMIT 5
     """
 
+# Details keep only the days of the same top 5 reasons the summary shows
+TOP_REASONS_SQL = """
+    ranked AS (
+        SELECT d.reason, d.count, d.date,
+               SUM(d.count) OVER (PARTITION BY d.reason) as reason_total
+        FROM detail_rows d
+    )
+    SELECT reason, count, date
+    FROM ranked
+    QUALIFY DENSE_RANK() OVER (ORDER BY reason_total DESC, reason) <= 5
+    ORDER BY count DESC
+    LIMIT 500
+    """
 
-def root_cause_pareto_details_sql(start_dt, end_dt):
-    """Get detailed root cause Pareto data"""
-    return f"""
+ROOT_CAUSE_PARETO_DETAILS_SQL = """
+    WITH detail_rows AS (
+        SELECT 
+            FAILURE_CODE as reason,
+            COUNT(*) as count,
+            DATE(CREATED) as date
+        FROM STRIPE.CHARGES
+        WHERE CREATED >= :1
+        AND CREATED <= :2
+        AND STATUS = 'failed'
+        AND FAILURE_CODE IS NOT NULL
+        GROUP BY FAILURE_CODE, DATE(CREATED)
+    ),""" + TOP_REASONS_SQL
+
+# The rollup only serves whole days inside [:1, :2] that the nightly task has rolled up,
+# [day_from, day_to). Partial boundary days and days not rolled up yet (normally just
+# today) are read live, so both paths count exactly the same charges.
+ROLLUP_RANGE_CTE = """
+    rollup_range AS (
+        SELECT IFF(DATE_TRUNC('DAY', :1) = :1, DATE(:1), DATEADD(DAY, 1, DATE(:1))) AS day_from,
+               LEAST(DATE(:2), COALESCE(DATEADD(DAY, 1, MAX(DAY)), '1970-01-01'::DATE)) AS day_to
+        FROM PUBLIC.CHARGE_FAILURES_DAILY
+    )"""
+
+ROOT_CAUSE_PARETO_ROLLUP_SUMMARY_SQL = f"""
+    WITH {ROLLUP_RANGE_CTE.strip()},
+    daily AS (
+        SELECT FAILURE_CODE, FAILED_COUNT
+        FROM PUBLIC.CHARGE_FAILURES_DAILY, rollup_range
+        WHERE DAY >= rollup_range.day_from
+        AND DAY < rollup_range.day_to
+        UNION ALL
+        SELECT 
+            FAILURE_CODE,
+            COUNT(*)
+        FROM STRIPE.CHARGES, rollup_range
+        WHERE CREATED >= :1
+        AND CREATED <= :2
+        AND (CREATED < rollup_range.day_from OR CREATED >= rollup_range.day_to)
+        AND STATUS = 'failed'
+        AND FAILURE_CODE IS NOT NULL
+        GROUP BY FAILURE_CODE
+    )
     SELECT 
         FAILURE_CODE as reason,
-        COUNT(*) as count,
-        DATE(CREATED) as date
-    FROM STRIPE.CHARGES
-    WHERE CREATED >= '{start_dt.isoformat()}'
-    AND CREATED <= '{end_dt.isoformat()}'
-    AND STATUS = 'failed'
-    AND FAILURE_CODE IS NOT NULL
-    GROUP BY FAILURE_CODE, DATE(CREATED)
+        SUM(FAILED_COUNT) as count
+    FROM daily
+    GROUP BY FAILURE_CODE
     ORDER BY count DESC
-    """ 
\ No newline at end of file
+    LIMIT 5
+    """
+
+ROOT_CAUSE_PARETO_ROLLUP_DETAILS_SQL = f"""
+    WITH {ROLLUP_RANGE_CTE.strip()},
+    detail_rows AS (
+        SELECT 
+            FAILURE_CODE as reason,
+            FAILED_COUNT as count,
+            DAY as date
+        FROM PUBLIC.CHARGE_FAILURES_DAILY, rollup_range
+        WHERE DAY >= rollup_range.day_from
+        AND DAY < rollup_range.day_to
+        UNION ALL
+        SELECT 
+            FAILURE_CODE as reason,
+            COUNT(*) as count,
+            DATE(CREATED) as date
+        FROM STRIPE.CHARGES, rollup_range
+        WHERE CREATED >= :1
+        AND CREATED <= :2
+        AND (CREATED < rollup_range.day_from OR CREATED >= rollup_range.day_to)
+        AND STATUS = 'failed'
+        AND FAILURE_CODE IS NOT NULL
+        GROUP BY FAILURE_CODE, DATE(CREATED)
+    ),""" + TOP_REASONS_SQL
+
+
+def root_cause_pareto_summary_sql(start_dt, end_dt):
+    """Calculate root cause Pareto summary"""
+    if USE_ROLLUP:
+        return ROOT_CAUSE_PARETO_ROLLUP_SUMMARY_SQL, (start_dt, end_dt)
+    return ROOT_CAUSE_PARETO_SUMMARY_SQL, (start_dt, end_dt)
+
+
+def root_cause_pareto_details_sql(start_dt, end_dt):
+    """Get detailed root cause Pareto data"""
+    if USE_ROLLUP:
+        return ROOT_CAUSE_PARETO_ROLLUP_DETAILS_SQL, (start_dt, end_dt)
+    return ROOT_CAUSE_PARETO_DETAILS_SQL, (start_dt, end_dt) 
\ No newline at end of file
@@ -1,51 +1,55 @@
-def summary_sql(start_dt, end_dt):
-    return f"""
-    WITH new_users AS (
-        SELECT ANONYMOUS_ID, MIN(ORIGINAL_TIMESTAMP) as first_event_date
+# Bind parameters: :1 = start date, :2 = end date
+# One pass over TRACKS instead of re-joining each new user's events back to the table.
+# The scan runs 24h past :2 so users first seen late in the window can still activate.
+USER_ACTIVATION_CTE = """
+    WITH user_events AS (
+        SELECT ANONYMOUS_ID, EVENT, ORIGINAL_TIMESTAMP,
+               MIN(CASE WHEN ORIGINAL_TIMESTAMP <= :2 THEN ORIGINAL_TIMESTAMP END)
+                   OVER (PARTITION BY ANONYMOUS_ID) as first_event_date
         FROM TRACKS
-        WHERE ORIGINAL_TIMESTAMP >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND ORIGINAL_TIMESTAMP <= '{end_dt.strftime('%Y-%m-%d')}'
-        GROUP BY ANONYMOUS_ID
+        WHERE ORIGINAL_TIMESTAMP >= :1
+          AND ORIGINAL_TIMESTAMP <= DATEADD(hour, 24, :2)
+    ),
+    activation_counts AS (
+        SELECT ANONYMOUS_ID, first_event_date,
+               COUNT(CASE WHEN EVENT IN ('purchase', 'complete_registration', 'schedule')
+                           AND ORIGINAL_TIMESTAMP <= DATEADD(hour, 24, first_event_date)
+                          THEN 1 END) as activation_events
+        FROM user_events
+        WHERE first_event_date IS NOT NULL
+        GROUP BY ANONYMOUS_ID, first_event_date
     ),
     activated_users AS (
-        SELECT nu.ANONYMOUS_ID, CASE WHEN COUNT(t.ORIGINAL_TIMESTAMP) > 0 THEN 1 ELSE 0 END as is_activated
-        FROM new_users nu
-        LEFT JOIN TRACKS t ON nu.ANONYMOUS_ID = t.ANONYMOUS_ID
-            AND t.ORIGINAL_TIMESTAMP BETWEEN nu.first_event_date AND DATEADD(hour, 24, nu.first_event_date)
-            AND t.EVENT IN ('purchase', 'complete_registration', 'schedule')
-        GROUP BY nu.ANONYMOUS_ID
+        SELECT ANONYMOUS_ID, first_event_date, activation_events,
+               CASE WHEN activation_events > 0 THEN 1 ELSE 0 END as is_activated
+        FROM activation_counts
     )
-    SELECT COUNT(*) as total_users, SUM(is_activated) as activated_users,
+"""
+
+SUMMARY_SQL = USER_ACTIVATION_CTE + """
+    SELECT COUNT(*) as total_users, COALESCE(SUM(is_activated), 0) as activated_users,
            CASE WHEN COUNT(*) > 0 THEN SUM(is_activated)::FLOAT / COUNT(*)::FLOAT ELSE 0 END as activation_rate
     FROM activated_users
     """
 
-def details_sql(start_dt, end_dt, activated_param=None):
-    filter_clause = ''
-    if activated_param == 'false':
-        filter_clause = 'WHERE is_activated = 0'
-    elif activated_param == 'true':
-        filter_clause = 'WHERE is_activated = 1'
-    return f"""
-    WITH new_users AS (
-        SELECT ANONYMOUS_ID, MIN(ORIGINAL_TIMESTAMP) as first_event_date
-        FROM TRACKS
-        WHERE ORIGINAL_TIMESTAMP >= '{start_dt.strftime('%Y-%m-%d')}'
-          AND ORIGINAL_TIMESTAMP <= '{end_dt.strftime('%Y-%m-%d')}'
-        GROUP BY ANONYMOUS_ID
-    ),
-    activated_users AS (
-        SELECT nu.ANONYMOUS_ID, nu.first_event_date, CASE WHEN COUNT(t.ORIGINAL_TIMESTAMP) > 0 THEN 1 ELSE 0 END as is_activated, COUNT(t.ORIGINAL_TIMESTAMP) as activation_events
-        FROM new_users nu
-        LEFT JOIN TRACKS t ON nu.ANONYMOUS_ID = t.ANONYMOUS_ID
-            AND t.ORIGINAL_TIMESTAMP BETWEEN nu.first_event_date AND DATEADD(hour, 24, nu.first_event_date)
-            AND t.EVENT IN ('purchase', 'complete_registration', 'schedule')
-        GROUP BY nu.ANONYMOUS_ID, nu.first_event_date
-    )
+DETAILS_SQL_TEMPLATE = USER_ACTIVATION_CTE + """
     SELECT ANONYMOUS_ID as user_id, first_event_date, is_activated, activation_events,
            CASE WHEN is_activated = 1 THEN 'Activated' ELSE 'Not Activated' END as status
     FROM activated_users
     {filter_clause}
     ORDER BY first_event_date DESC
     LIMIT 100
-    """ 
\ No newline at end of file
+    """
+
+# One fixed statement per filter value so each variant keeps a stable SQL text
+DETAILS_SQL = {
+    None: DETAILS_SQL_TEMPLATE.format(filter_clause=''),
+    'false': DETAILS_SQL_TEMPLATE.format(filter_clause='WHERE is_activated = 0'),
+    'true': DETAILS_SQL_TEMPLATE.format(filter_clause='WHERE is_activated = 1'),
+}
+
+def summary_sql(start_dt, end_dt):
+    return SUMMARY_SQL, (start_dt.date(), end_dt.date())
+
+def details_sql(start_dt, end_dt, activated=None):
+    return DETAILS_SQL.get(activated, DETAILS_SQL[None]), (start_dt.date(), end_dt.date())
@@ -5,53 +5,213 @@ Clean service for handling all Snowflake database operations.
 
 import os
 import time
+import hashlib
+import threading
 import traceback
 import logging
-from datetime import datetime
-from typing import List, Dict
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Collection, List, Dict, Optional, Sequence, Tuple, Union
+import orjson
 import pandas as pd
 import snowflake.connector
+from cachetools import TLRUCache, TTLCache
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
 
+from queries.data_freshness import data_freshness_sql
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
 logger = logging.getLogger(__name__)
 
+# Session-wide tag; individual statements append the metric they compute
+QUERY_TAG = 'saas_metrics_dashboard'
+
 
 class SnowflakeConnectionError(Exception):
     """Custom exception for Snowflake connection issues"""
     pass
 
 
-class SnowflakeService:
-    """Service for handling Snowflake database operations"""
+class ConnectionPool:
+    """Thread-safe pool of authenticated Snowflake connections"""
     
-    def __init__(self):
-        self.conn = None
-        self.last_connection_time = None
-        self.connection_timeout = 300  # 5 minutes
+    def __init__(self, connect, size: int = 8, max_idle: int = 300):
+        self._connect = connect
+        self.size = size
+        self.max_idle = max_idle  # seconds before an idle connection is re-checked
+        self._idle = []  # (conn, last_used) pairs, most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
     
-    def get_connection(self):
-        """Get or create Snowflake connection with connection pooling"""
-        current_time = time.time()
-        
-        # Check if connection is stale or doesn't exist
-        if (self.conn is None or 
-            self.last_connection_time is None or 
-            current_time - self.last_connection_time > self.connection_timeout):
+    def acquire(self):
+        """Check out a healthy connection, creating one if none are idle"""
+        self._slots.acquire()
+        try:
+            conn = None
+            with self._lock:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
             
-            if self.conn:
-                try:
-                    self.conn.close()
-                except:
-                    pass
+            if conn is not None and time.time() - last_used > self.max_idle:
+                if not self._is_connection_alive(conn):
+                    self._close(conn)
+                    conn = None
             
-            self.conn = self._create_connection()
-            self.last_connection_time = current_time
-            logger.info("Created new Snowflake connection")
-        
-        return self.conn
+            if conn is None:
+                conn = self._connect()
+                logger.info("Created new Snowflake connection")
+            
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, closing it if it is no longer usable"""
+        try:
+            if not discard and not conn.is_closed():
+                with self._lock:
+                    if len(self._idle) < self.size:
+                        self._idle.append((conn, time.time()))
+                        return
+            # Unusable, or the pool already holds `size` idle sessions
+            self._close(conn)
+        finally:
+            self._slots.release()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except snowflake.connector.errors.OperationalError:
+            # Network/session failures leave the connection unusable
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+    
+    def prefill(self, count: int) -> int:
+        """Log in up to `count` connections ahead of the first request"""
+        conns = []
+        try:
+            for _ in range(min(count, self.size)):
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+        return len(conns)
+    
+    def ping_idle(self):
+        """Round-trip every idle connection so none reaches max_idle and needs re-checking on acquire"""
+        with self._lock:
+            pending = [conn for conn, _ in self._idle]
+        for conn in pending:
+            # Hold a slot while the connection is off the idle list, so acquire
+            # cannot open a replacement and push the pool past `size` sessions
+            if not self._slots.acquire(blocking=False):
+                break  # every slot is checked out, so nothing is left idle to keep warm
+            try:
+                with self._lock:
+                    entry = next((e for e in self._idle if e[0] is conn), None)
+                    if entry is None:
+                        continue  # checked out meanwhile
+                    self._idle.remove(entry)
+                if self._is_connection_alive(conn):
+                    with self._lock:
+                        # Connections released meanwhile were used more recently, so they stay at the end
+                        self._idle.insert(0, (conn, time.time()))
+                else:
+                    self._close(conn)
+            finally:
+                self._slots.release()
+    
+    def start_keepalive(self, interval: int = 240):
+        """Ping idle connections every `interval` seconds from a daemon thread"""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.ping_idle()
+        threading.Thread(target=run, name='snowflake-keepalive', daemon=True).start()
+    
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+    
+    @staticmethod
+    def _is_connection_alive(conn) -> bool:
+        """Cheap round-trip to verify an idle session is still usable"""
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1", timeout=5)
+            finally:
+                cur.close()
+            return True
+        except Exception as e:
+            logger.info("Discarding stale Snowflake connection: %s", e)
+            return False
+    
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _load_private_key_der(pem_path: str) -> bytes:
+    """DER bytes of the PEM key, re-parsed only when the file changes (e.g. key rotation)"""
+    if not os.path.exists(pem_path):
+        # Try .pem extension as fallback
+        pem_path = pem_path.replace('.p8', '.pem')
+        if not os.path.exists(pem_path):
+            raise FileNotFoundError(f"Private key file not found: {pem_path}")
+    
+    return _parse_private_key_der(pem_path, os.stat(pem_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=1)
+def _parse_private_key_der(pem_path: str, mtime_ns: int) -> bytes:
+    """Parse the PEM key once per (path, mtime); failures are not cached"""
+    with open(pem_path, 'rb') as key_file:
+        private_key_pem = key_file.read()
+    
+    private_key = load_pem_private_key(private_key_pem, password=None)
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+
+
+class SnowflakeService:
+    """Service for handling Snowflake database operations"""
+    
+    DATA_VERSION_TTL = 60  # seconds between freshness checks
+    DATA_VERSION_RETRY = 10  # seconds to wait after a failed check before querying again
+    
+    def __init__(self, pool: ConnectionPool = None):
+        self.pool = pool or get_pool()
+        self._data_version = TTLCache(maxsize=1, ttl=self.DATA_VERSION_TTL)
+        self._data_version_lock = threading.Lock()
+        self._data_version_retry_at = 0.0
     
-    def _create_connection(self):
+    def connection(self):
+        """Borrow a pooled Snowflake connection (use as a context manager)"""
+        return self.pool.connection()
+    
+    @staticmethod
+    def _create_connection():
         """Create a Snowflake connection using PEM key authentication"""
         try:
             account = os.getenv('SNOWFLAKE_ACCOUNT', 'TOOOUVG-RHB65714')
@@ -63,22 +223,7 @@ class SnowflakeService:
             
             pem_path = os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH', 
                                'snowflake_private_key.p8')
-            
-            if not os.path.exists(pem_path):
-                # Try .pem extension as fallback
-                pem_path = pem_path.replace('.p8', '.pem')
-                if not os.path.exists(pem_path):
-                    raise FileNotFoundError(f"Private key file not found: {pem_path}")
-            
-            with open(pem_path, 'rb') as key_file:
-                private_key_pem = key_file.read()
-            
-            private_key = load_pem_private_key(private_key_pem, password=None)
-            private_key_der = private_key.private_bytes(
-                encoding=serialization.Encoding.DER,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            )
+            private_key_der = _load_private_key_der(pem_path)
             
             conn = snowflake.connector.connect(
                 account=account,
@@ -88,54 +233,389 @@ class SnowflakeService:
                 database=database,
                 schema=schema,
                 private_key=private_key_der,
-                insecure_mode=True,
+                # OCSP stays on; responses are cached on disk (SF_OCSP_RESPONSE_CACHE_DIR)
+                # so reconnects skip the extra round trip
+                insecure_mode=os.getenv('SNOWFLAKE_INSECURE_MODE', 'false').lower() == 'true',
                 autocommit=True,
+                # Bind server-side with :1, :2 placeholders so the SQL text stays constant
+                paramstyle='numeric',
                 session_parameters={
-                    'QUERY_TAG': 'saas_metrics_dashboard'
+                    'QUERY_TAG': QUERY_TAG
                 }
             )
             
             return conn
             
         except Exception as e:
-            logger.error(f"Snowflake connection error: {e}")
+            logger.error("Snowflake connection error: %s", e)
             traceback.print_exc()
             raise SnowflakeConnectionError(f"Failed to connect to Snowflake: {str(e)}")
     
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute a SQL query and return DataFrame with error handling"""
-        conn = self.get_connection()
+    def execute_query(self, query: str, params: Optional[Sequence] = None,
+                      use_cache: bool = True, query_tag: Optional[str] = None,
+                      open_ended: bool = False) -> pd.DataFrame:
+        """Execute a SQL query with optional bind parameters and return a DataFrame.
+        open_ended marks queries that read past their bound dates, which are never cached as settled."""
+        cache_key = _result_cache_key('frame', query, params) if use_cache else None
+        if cache_key:
+            cached = _result_cache_get(cache_key)
+            if cached is not None:
+                # Shallow copy: callers may rename or add columns without touching the cached frame
+                return cached.copy(deep=False)
+        
         start_time = time.time()
         
         try:
-            logger.info(f"Executing query: {query[:100]}...")
-            df = pd.read_sql(query, conn)
-            execution_time = time.time() - start_time
-            logger.info(f"Query executed successfully in {execution_time:.2f}s, "
-                       f"returned {len(df)} rows")
+            with self.connection() as conn:
+                logger.debug("Executing query: %.100s...", query)
+                cur = conn.cursor()
+                try:
+                    cur.execute(query, params, _statement_params=_statement_params(query_tag))
+                    # Arrow result batches decode straight into columns
+                    df = cur.fetch_pandas_all()
+                    # Snowflake upper-cases unquoted identifiers; normalize once here
+                    df.columns = df.columns.str.lower()
+                finally:
+                    cur.close()
+            logger.debug("Query executed successfully in %.2fs, returned %d rows",
+                         time.time() - start_time, len(df))
+            if cache_key:
+                _result_cache_set(cache_key, df, params, open_ended)
             return df
+        except SnowflakeConnectionError:
+            raise
         except Exception as e:
             execution_time = time.time() - start_time
-            logger.error(f"Query execution failed after {execution_time:.2f}s: {e}")
+            logger.error("Query execution failed after %.2fs: %s", execution_time, e)
             raise Exception(f"Query execution failed: {str(e)}")
     
+    def execute_query_arrow(self, query: str, params: Optional[Sequence] = None,
+                            query_tag: Optional[str] = None, open_ended: bool = False) -> 'pa.Table':
+        """Execute a SQL query and return its result as a pyarrow Table, skipping pandas"""
+        cache_key = _result_cache_key('arrow', query, params)
+        cached = _result_cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        start_time = time.time()
+        
+        try:
+            with self.connection() as conn:
+                logger.debug("Executing query: %.100s...", query)
+                cur = conn.cursor()
+                try:
+                    cur.execute(query, params, _statement_params=_statement_params(query_tag))
+                    # force_return_table keeps the schema even when there are no rows
+                    table = cur.fetch_arrow_all(force_return_table=True)
+                finally:
+                    cur.close()
+            table = table.rename_columns([name.lower() for name in table.column_names])
+            logger.debug("Query executed successfully in %.2fs, returned %d rows",
+                         time.time() - start_time, table.num_rows)
+            _result_cache_set(cache_key, table, params, open_ended)
+            return table
+        except SnowflakeConnectionError:
+            raise
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error("Query execution failed after %.2fs: %s", execution_time, e)
+            raise Exception(f"Query execution failed: {str(e)}")
+    
+    def execute_query_records(self, query: str, params: Optional[Sequence] = None,
+                              query_tag: Optional[str] = None, open_ended: bool = False) -> List[Dict]:
+        """Execute a SQL query and stream its Arrow result batches into JSON-ready records"""
+        cache_key = _result_cache_key('records', query, params)
+        cached = _result_cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        start_time = time.time()
+        
+        try:
+            with self.connection() as conn:
+                logger.debug("Executing query: %.100s...", query)
+                records = []
+                cur = conn.cursor()
+                try:
+                    cur.execute(query, params, _statement_params=_statement_params(query_tag))
+                    # Convert batch by batch so the full result never sits in one DataFrame
+                    for batch in cur.fetch_pandas_batches():
+                        batch.columns = batch.columns.str.lower()
+                        records.extend(self.clean_dataframe_for_json(batch))
+                finally:
+                    cur.close()
+            logger.debug("Query executed successfully in %.2fs, returned %d rows",
+                         time.time() - start_time, len(records))
+            _result_cache_set(cache_key, records, params, open_ended)
+            return records
+        except SnowflakeConnectionError:
+            raise
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error("Query execution failed after %.2fs: %s", execution_time, e)
+            raise Exception(f"Query execution failed: {str(e)}")
+    
+    def execute_queries_async(self, queries: Dict[str, Tuple[str, Optional[Sequence]]],
+                              poll_interval: float = 0.05,
+                              max_poll_interval: float = 1.0,
+                              open_ended: Collection[str] = ()) -> Dict[str, Union[pd.DataFrame, Exception]]:
+        """
+        Submit independent queries with execute_async on one pooled connection and
+        collect their results. The warehouse runs them concurrently, so no thread is
+        held per query. A failed query maps to its exception instead of a DataFrame
+        so one bad metric does not sink the rest. Status polling backs off from
+        poll_interval to max_poll_interval so slow batches cost few status calls.
+        Keys in open_ended are queries that read past their bound dates (see execute_query).
+        """
+        start_time = time.time()
+        results = {}
+        
+        to_submit = {}
+        for key, (query, params) in queries.items():
+            cache_key = _result_cache_key('frame', query, params)
+            cached = _result_cache_get(cache_key)
+            if cached is not None:
+                results[key] = cached.copy(deep=False)
+            else:
+                to_submit[key] = (query, params, cache_key)
+        
+        if to_submit:
+            conn = self.pool.acquire()
+            broken = False
+            try:
+                pending = {}
+                for key, (query, params, cache_key) in to_submit.items():
+                    try:
+                        cur = conn.cursor()
+                        cur.execute_async(query, params, _statement_params=_statement_params(key))
+                        pending[key] = (cur, cur.sfqid)
+                    except Exception as e:
+                        logger.error("Failed to submit query for %s: %s", key, e)
+                        results[key] = Exception(f"Query execution failed: {str(e)}")
+                        # Per-query errors are swallowed, so note session failures for release
+                        broken = broken or isinstance(e, snowflake.connector.errors.OperationalError)
+                
+                while pending:
+                    for key, (cur, query_id) in list(pending.items()):
+                        try:
+                            status = conn.get_query_status_throw_if_error(query_id)
+                            if conn.is_still_running(status):
+                                continue
+                            cur.get_results_from_sfqid(query_id)
+                            df = cur.fetch_pandas_all()
+                            df.columns = df.columns.str.lower()
+                            results[key] = df
+                            _, params, cache_key = to_submit[key]
+                            _result_cache_set(cache_key, df, params, key in open_ended)
+                        except Exception as e:
+                            logger.error("Query for %s failed: %s", key, e)
+                            results[key] = Exception(f"Query execution failed: {str(e)}")
+                            broken = broken or isinstance(e, snowflake.connector.errors.OperationalError)
+                        cur.close()
+                        del pending[key]
+                    if pending:
+                        time.sleep(poll_interval)
+                        poll_interval = min(poll_interval * 2, max_poll_interval)
+            except snowflake.connector.errors.OperationalError:
+                broken = True
+                raise
+            finally:
+                self.pool.release(conn, discard=broken)
+        
+        logger.info("Executed %d async queries (%d cached) in %.2fs",
+                    len(to_submit), len(queries) - len(to_submit), time.time() - start_time)
+        return results
+    
+    def get_data_version(self) -> str:
+        """Latest load time of the source tables, re-checked at most once a minute"""
+        with self._data_version_lock:
+            version = self._data_version.get('version')
+            retry_at = self._data_version_retry_at
+        if version is None:
+            # While Snowflake is failing, don't send every request to INFORMATION_SCHEMA
+            if time.monotonic() < retry_at:
+                raise SnowflakeConnectionError("Data version check failed recently; retrying shortly")
+            try:
+                query, params = data_freshness_sql()
+                df = self.execute_query(query, params, use_cache=False)
+            except Exception:
+                with self._data_version_lock:
+                    self._data_version_retry_at = time.monotonic() + self.DATA_VERSION_RETRY
+                raise
+            version = str(df.iloc[0]['last_altered']) if not df.empty else ''
+            with self._data_version_lock:
+                self._data_version['version'] = version
+        return version
+    
     def clean_dataframe_for_json(self, df: pd.DataFrame) -> List[Dict]:
         """Clean DataFrame to handle NaT, NaN, and other non-serializable values"""
         if df.empty:
             return []
         
-        df_clean = df.where(pd.notnull(df), None)
-        records = []
+        # Single object-dtype copy; numpy scalars become native Python values
+        mask = df.isna()
+        df_clean = df.astype(object)
         
-        for _, row in df_clean.iterrows():
-            record = {}
-            for col, value in row.items():
-                if pd.isna(value) or value is None:
-                    record[col] = None
-                elif isinstance(value, (pd.Timestamp, datetime)):
-                    record[col] = value.isoformat() if pd.notna(value) else None
-                else:
-                    record[col] = value
-            records.append(record)
+        # Integer columns that picked up NULLs arrive as float64 - emit 5 rather than 5.0
+        for col in df.select_dtypes(include=['floating']).columns:
+            values = df[col].dropna()
+            if not values.empty and (values % 1 == 0).all() and values.abs().max() < 2 ** 53:
+                df_clean[col] = df[col].astype('Int64').astype(object)
+        
+        # Format datetime columns in one vectorized pass per column
+        for col in df.select_dtypes(include=['datetime64[ns]']).columns:
+            df_clean[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        for col in df.select_dtypes(include=['datetimetz']).columns:
+            df_clean[col] = df[col].dt.tz_convert('UTC').dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        # Snowflake DATE columns arrive as object dtype - check one value per column, not every cell
+        for col in df.select_dtypes(include=['object']).columns:
+            first = df[col].first_valid_index()
+            if first is not None and _is_plain_date(df[col].at[first]):
+                df_clean[col] = pd.to_datetime(df[col]).dt.strftime('%Y-%m-%d')
         
-        return records 
\ No newline at end of file
+        # NaN/NaT become None, masked in place rather than through a where() copy
+        df_clean[mask] = None
+        return df_clean.to_dict('records')
+
+
+RESULT_CACHE_TTL = 300  # 5 minutes for windows that include today
+HISTORICAL_RESULT_CACHE_TTL = 24 * 60 * 60  # windows that have settled no longer change
+# The rollup refresh rebuilds the trailing 2 days for late data, and t24h_activation_rate
+# reads a day past its window, so a window only settles this long after it ends
+SETTLE_DAYS = 3
+
+# Process-wide query result cache; each entry carries its own TTL
+_result_cache = TLRUCache(maxsize=512, ttu=lambda key, value, now: now + value[1])
+_result_cache_lock = threading.Lock()
+
+# Optional Redis second level shared by every worker and surviving restarts
+RESULT_CACHE_REDIS_URL = os.getenv('RESULT_CACHE_REDIS_URL')
+_redis = None
+
+
+def _result_cache_key(kind: str, query: str, params: Optional[Sequence]) -> str:
+    return hashlib.blake2b(f"{kind}\0{query}\0{params!r}".encode(), digest_size=16).hexdigest()
+
+
+def window_settled(end: date) -> bool:
+    """True once no late data or rollup rebuild can still change a window ending on `end`"""
+    if isinstance(end, datetime):
+        end = end.date()
+    return end + timedelta(days=SETTLE_DAYS) < date.today()
+
+
+def _result_ttl(params: Optional[Sequence], open_ended: bool = False) -> int:
+    """Results whose bound dates have all settled are immutable, unless the query reads past them"""
+    bound_dates = [p.date() if isinstance(p, datetime) else p
+                   for p in params or () if isinstance(p, date)]
+    if not open_ended and bound_dates and window_settled(max(bound_dates)):
+        return HISTORICAL_RESULT_CACHE_TTL
+    return RESULT_CACHE_TTL
+
+
+def _shared_result_cache():
+    """Redis client for the shared cache, or None when RESULT_CACHE_REDIS_URL is unset"""
+    global _redis
+    if _redis is None and RESULT_CACHE_REDIS_URL:
+        import redis
+        _redis = redis.Redis.from_url(RESULT_CACHE_REDIS_URL, socket_timeout=1)
+    return _redis
+
+
+def _encode_result(result) -> bytes:
+    """Serialize a result for Redis: Arrow IPC for frames and tables, JSON for records.
+    Never pickle - anyone able to write to Redis could otherwise run code in every worker."""
+    import pyarrow as pa
+    if isinstance(result, list):
+        return b'J' + orjson.dumps(result)
+    tag = b'F' if isinstance(result, pd.DataFrame) else b'A'
+    table = pa.Table.from_pandas(result, preserve_index=False) if tag == b'F' else result
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return tag + sink.getvalue().to_pybytes()
+
+
+def _decode_result(payload: bytes):
+    import pyarrow as pa
+    tag, body = payload[:1], payload[1:]
+    if tag == b'J':
+        return orjson.loads(body)
+    if tag not in (b'F', b'A'):
+        raise ValueError(f"Unknown result cache payload tag {tag!r}")
+    table = pa.ipc.open_stream(body).read_all()
+    return table.to_pandas() if tag == b'F' else table
+
+
+def _result_cache_get(key: str):
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+    if entry is not None:
+        return entry[0]
+    
+    shared = _shared_result_cache()
+    if shared is None:
+        return None
+    try:
+        payload, ttl = shared.pipeline().get(f"sf:{key}").ttl(f"sf:{key}").execute()
+    except Exception as e:
+        # A cache outage must never fail the query itself
+        logger.warning("Shared result cache read failed: %s", e)
+        return None
+    if payload is None:
+        return None
+    
+    try:
+        result = _decode_result(payload)
+    except Exception as e:
+        # A corrupt or foreign entry is just a miss
+        logger.warning("Shared result cache entry undecodable: %s", e)
+        return None
+    with _result_cache_lock:
+        _result_cache[key] = (result, max(ttl, 1))
+    return result
+
+
+def _result_cache_set(key: str, result, params: Optional[Sequence], open_ended: bool = False):
+    ttl = _result_ttl(params, open_ended)
+    with _result_cache_lock:
+        _result_cache[key] = (result, ttl)
+    
+    shared = _shared_result_cache()
+    if shared is not None:
+        try:
+            shared.setex(f"sf:{key}", ttl, _encode_result(result))
+        except Exception as e:
+            logger.warning("Shared result cache write failed: %s", e)
+
+
+def _statement_params(query_tag: Optional[str]) -> Optional[Dict[str, str]]:
+    """Per-statement QUERY_TAG so query history groups by metric without an ALTER SESSION round-trip"""
+    return {'QUERY_TAG': f"{QUERY_TAG}:{query_tag}"} if query_tag else None
+
+
+def _is_plain_date(value) -> bool:
+    """datetime is a subclass of date, so rule it out explicitly"""
+    return isinstance(value, date) and not isinstance(value, datetime)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Get the process-wide Snowflake connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    SnowflakeService._create_connection,
+                    size=int(os.getenv('SNOWFLAKE_POOL_SIZE', 8))
+                )
+    return _pool
+
+
+def snowflake_session():
+    """Borrow a connection from the shared pool: `with snowflake_session() as conn:`"""
+    return get_pool().connection()
@@ -0,0 +1,49 @@
+-- Daily rollup of failed STRIPE.CHARGES for the root cause Pareto metric.
+--
+-- One row per (day, failure code) with the number of failed charges, so any
+-- date range is answered by summing a handful of small rows instead of
+-- grouping raw charges. Run this once, then set USE_CHARGE_FAILURE_ROLLUP=true
+-- so queries/root_cause_pareto.py reads the rollup.
+
+CREATE TABLE IF NOT EXISTS PUBLIC.CHARGE_FAILURES_DAILY (
+    DAY DATE NOT NULL,
+    FAILURE_CODE VARCHAR NOT NULL,
+    FAILED_COUNT NUMBER NOT NULL
+)
+CLUSTER BY (DAY);
+
+-- Backfill every complete day
+INSERT INTO PUBLIC.CHARGE_FAILURES_DAILY
+SELECT
+    DATE(CREATED) AS DAY,
+    FAILURE_CODE,
+    COUNT(*) AS FAILED_COUNT
+FROM STRIPE.CHARGES
+WHERE STATUS = 'failed'
+  AND FAILURE_CODE IS NOT NULL
+  AND CREATED < CURRENT_DATE()
+GROUP BY 1, 2;
+
+-- Nightly refresh: rebuild the last two days so late-synced charges are picked up
+CREATE OR REPLACE TASK PUBLIC.CHARGE_FAILURES_DAILY_REFRESH
+    WAREHOUSE = AUTOMATION_WH
+    SCHEDULE = 'USING CRON 20 2 * * * UTC'
+AS
+BEGIN
+    DELETE FROM PUBLIC.CHARGE_FAILURES_DAILY
+    WHERE DAY >= DATEADD(DAY, -2, CURRENT_DATE());
+
+    INSERT INTO PUBLIC.CHARGE_FAILURES_DAILY
+    SELECT
+        DATE(CREATED) AS DAY,
+        FAILURE_CODE,
+        COUNT(*) AS FAILED_COUNT
+    FROM STRIPE.CHARGES
+    WHERE STATUS = 'failed'
+      AND FAILURE_CODE IS NOT NULL
+      AND CREATED >= DATEADD(DAY, -2, CURRENT_DATE())
+      AND CREATED < CURRENT_DATE()
+    GROUP BY 1, 2;
+END;
+
+ALTER TASK PUBLIC.CHARGE_FAILURES_DAILY_REFRESH RESUME;
@@ -0,0 +1,50 @@
+-- Daily platform rollup of PAGE_VIEW for the platform breakdown metric.
+--
+-- One row per (day, platform) with the event count and a HyperLogLog state of
+-- USER_ID, so any date range is answered by combining a handful of small rows
+-- instead of a COUNT(DISTINCT) over raw page views. Run this once, then set
+-- USE_PAGE_VIEW_ROLLUP=true so queries/platform_breakdown.py reads the rollup.
+
+CREATE TABLE IF NOT EXISTS PUBLIC.PAGE_VIEW_PLATFORM_DAILY (
+    DAY DATE NOT NULL,
+    PLATFORM VARCHAR NOT NULL,
+    EVENT_COUNT NUMBER NOT NULL,
+    USERS_HLL BINARY NOT NULL
+)
+CLUSTER BY (DAY);
+
+-- Backfill every complete day
+INSERT INTO PUBLIC.PAGE_VIEW_PLATFORM_DAILY
+SELECT
+    DATE(TIMESTAMP) AS DAY,
+    CONTEXT_USER_AGENT_DATA_PLATFORM AS PLATFORM,
+    COUNT(*) AS EVENT_COUNT,
+    HLL_ACCUMULATE(USER_ID) AS USERS_HLL
+FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW
+WHERE CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
+  AND TIMESTAMP < CURRENT_DATE()
+GROUP BY 1, 2;
+
+-- Nightly refresh: rebuild the last two days so late-arriving events are picked up
+CREATE OR REPLACE TASK PUBLIC.PAGE_VIEW_PLATFORM_DAILY_REFRESH
+    WAREHOUSE = AUTOMATION_WH
+    SCHEDULE = 'USING CRON 15 2 * * * UTC'
+AS
+BEGIN
+    DELETE FROM PUBLIC.PAGE_VIEW_PLATFORM_DAILY
+    WHERE DAY >= DATEADD(DAY, -2, CURRENT_DATE());
+
+    INSERT INTO PUBLIC.PAGE_VIEW_PLATFORM_DAILY
+    SELECT
+        DATE(TIMESTAMP) AS DAY,
+        CONTEXT_USER_AGENT_DATA_PLATFORM AS PLATFORM,
+        COUNT(*) AS EVENT_COUNT,
+        HLL_ACCUMULATE(USER_ID) AS USERS_HLL
+    FROM COURSECREATOR360_WEBSITE_JS_PROD.PAGE_VIEW
+    WHERE CONTEXT_USER_AGENT_DATA_PLATFORM IS NOT NULL
+      AND TIMESTAMP >= DATEADD(DAY, -2, CURRENT_DATE())
+      AND TIMESTAMP < CURRENT_DATE()
+    GROUP BY 1, 2;
+END;
+
+ALTER TASK PUBLIC.PAGE_VIEW_PLATFORM_DAILY_REFRESH RESUME;
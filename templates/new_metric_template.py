@@ -3,19 +3,9 @@ Template for adding new metrics
 Copy this file and modify it to create a new metric.
 """
 
-def summary_sql(start_dt, end_dt):
-    """
-    Summary query for the metric.
-    Should return one row with the main metric value and supporting data.
-    
-    Args:
-        start_dt: Start datetime
-        end_dt: End datetime
-    
-    Returns:
-        SQL query string
-    """
-    return f"""
+# Bind parameters: :1 = start date, :2 = end date
+# SQL is built once at import; builders only pair a constant with its binds.
+SUMMARY_SQL = """
     -- Your summary query here
     -- Should return columns like: value, numerator, denominator, rate, etc.
     SELECT 
@@ -28,30 +18,11 @@ def summary_sql(start_dt, end_dt):
             ELSE 0 
         END as rate
     FROM your_table
-    WHERE timestamp >= '{start_dt.strftime('%Y-%m-%d')}'
-      AND timestamp <= '{end_dt.strftime('%Y-%m-%d')}'
+    WHERE timestamp >= :1
+      AND timestamp <= :2
     """
 
-
-def details_sql(start_dt, end_dt, **params):
-    """
-    Details query for the metric.
-    Should return multiple rows with detailed breakdown.
-    
-    Args:
-        start_dt: Start datetime
-        end_dt: End datetime
-        **params: Additional parameters (e.g., filters)
-    
-    Returns:
-        SQL query string
-    """
-    # Handle optional parameters
-    filter_clause = ''
-    if params.get('some_filter') == 'true':
-        filter_clause = 'WHERE some_column = true'
-    
-    return f"""
+DETAILS_SQL_TEMPLATE = """
     -- Your details query here
     -- Should return detailed breakdown data
     SELECT 
@@ -61,13 +32,51 @@ def details_sql(start_dt, end_dt, **params):
         category,
         status
     FROM your_table
-    WHERE timestamp >= '{start_dt.strftime('%Y-%m-%d')}'
-      AND timestamp <= '{end_dt.strftime('%Y-%m-%d')}'
+    WHERE timestamp >= :1
+      AND timestamp <= :2
     {filter_clause}
     ORDER BY timestamp DESC
     LIMIT 100
     """
 
+# One fixed statement per filter value - never format request values into the query text
+DETAILS_SQL = {
+    None: DETAILS_SQL_TEMPLATE.format(filter_clause=''),
+    'true': DETAILS_SQL_TEMPLATE.format(filter_clause='AND some_column = true'),
+}
+
+
+def summary_sql(start_dt, end_dt):
+    """
+    Summary query for the metric.
+    Should return one row with the main metric value and supporting data.
+    
+    Args:
+        start_dt: Start datetime
+        end_dt: End datetime
+    
+    Returns:
+        (SQL query string, bind parameters) - dates are bound as :1 and :2,
+        never formatted into the SQL text
+    """
+    return SUMMARY_SQL, (start_dt.date(), end_dt.date())
+
+
+def details_sql(start_dt, end_dt, some_filter=None):
+    """
+    Details query for the metric.
+    Should return multiple rows with detailed breakdown.
+    
+    Args:
+        start_dt: Start datetime
+        end_dt: End datetime
+        some_filter: Optional filter value from the query string (e.g. 'true')
+    
+    Returns:
+        (SQL query string, bind parameters)
+    """
+    return DETAILS_SQL.get(some_filter, DETAILS_SQL[None]), (start_dt.date(), end_dt.date())
+
 
 # Example usage in metrics_registry.py:
 """
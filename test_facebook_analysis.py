@@ -14,8 +14,8 @@ load_dotenv()
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(__file__))
 
-# Import the connection function
-from app import get_snowflake_connection
+# Import the shared connection pool
+from snowflake_service import get_pool
 
 # Import the query functions
 from queries.facebook_subscription_analysis import (
@@ -29,63 +29,56 @@ def main():
         print("🔍 Running Facebook Subscription Analysis...")
         print("=" * 60)
         
-        # Get database connection
-        conn = get_snowflake_connection()
-        
-        # Run summary query first
-        print("\n📊 SUMMARY STATISTICS:")
-        print("-" * 30)
-        summary_query = facebook_subscription_summary_query()
-        df_summary = pd.read_sql(summary_query, conn)
-        
-        if not df_summary.empty:
-            summary = df_summary.iloc[0]
-            print(f"Total Subscriptions (last 30 days): {summary['TOTAL_SUBSCRIPTIONS']}")
-            print(f"From Facebook Lead Ads: {summary['FROM_FACEBOOK']}")
-            print(f"From Other Sources: {summary['FROM_OTHER_SOURCES']}")
-            print(f"Facebook Percentage: {summary['FACEBOOK_PERCENTAGE']}%")
-        else:
-            print("No summary data found")
+        # Borrow a database connection from the pool; it goes back even if a query fails
+        pool = get_pool()
+        with pool.connection() as conn:
+            # Run summary query first
+            print("\n📊 SUMMARY STATISTICS:")
+            print("-" * 30)
+            summary_query = facebook_subscription_summary_query()
+            df_summary = conn.cursor().execute(summary_query).fetch_pandas_all()
         
-        # Run detailed analysis
-        print("\n📋 DETAILED SUBSCRIPTION DATA:")
-        print("-" * 40)
-        detailed_query = facebook_subscription_analysis_query()
-        df_detailed = pd.read_sql(detailed_query, conn)
+            if not df_summary.empty:
+                summary = df_summary.iloc[0]
+                print(f"Total Subscriptions (last 30 days): {summary['TOTAL_SUBSCRIPTIONS']}")
+                print(f"From Facebook Lead Ads: {summary['FROM_FACEBOOK']}")
+                print(f"From Other Sources: {summary['FROM_OTHER_SOURCES']}")
+                print(f"Facebook Percentage: {summary['FACEBOOK_PERCENTAGE']}%")
+            else:
+                print("No summary data found")
         
-        if not df_detailed.empty:
-            print(f"Found {len(df_detailed)} subscriptions")
-            print("\nFirst 10 records:")
+            # Run detailed analysis
+            print("\n📋 DETAILED SUBSCRIPTION DATA:")
             print("-" * 40)
+            detailed_query = facebook_subscription_analysis_query()
+            df_detailed = conn.cursor().execute(detailed_query).fetch_pandas_all()
+        
+            if not df_detailed.empty:
+                print(f"Found {len(df_detailed)} subscriptions")
+                print("\nFirst 10 records:")
+                print("-" * 40)
             
-            # Display first 10 records
-            for idx, row in df_detailed.head(10).iterrows():
-                print(f"\n{idx + 1}. {row['CUSTOMER_NAME'] or 'N/A'}")
-                print(f"   Email: {row['CUSTOMER_EMAIL']}")
-                print(f"   Product: {row['PRODUCT_NAME']}")
-                print(f"   Created: {row['CREATED']}")
-                print(f"   Status: {row['STATUS']}")
-                print(f"   From Facebook: {row['FROM_FACEBOOK']}")
-                if row['FROM_FACEBOOK'] == 'Yes':
-                    print(f"   Facebook Email: {row['FACEBOOK_EMAIL']}")
-                    print(f"   Facebook Phone: {row['FACEBOOK_PHONE']}")
+                # Display first 10 records as one table
+                print(df_detailed.head(10)[[
+                    'CUSTOMER_NAME', 'CUSTOMER_EMAIL', 'PRODUCT_NAME', 'CREATED', 'STATUS',
+                    'FROM_FACEBOOK', 'FACEBOOK_EMAIL', 'FACEBOOK_PHONE'
+                ]].fillna('').to_string(index=False))
             
-            # Show breakdown by product
-            print("\n📈 BREAKDOWN BY PRODUCT:")
-            print("-" * 30)
-            product_breakdown = df_detailed.groupby(['PRODUCT_NAME', 'FROM_FACEBOOK']).size().unstack(fill_value=0)
-            print(product_breakdown)
+                # Show breakdown by product
+                print("\n📈 BREAKDOWN BY PRODUCT:")
+                print("-" * 30)
+                product_breakdown = pd.crosstab(df_detailed['PRODUCT_NAME'], df_detailed['FROM_FACEBOOK'])
+                print(product_breakdown)
             
-            # Show breakdown by attribution
-            print("\n🎯 ATTRIBUTION BREAKDOWN:")
-            print("-" * 30)
-            attribution_breakdown = df_detailed['ATTRIBUTION_SOURCE'].value_counts()
-            print(attribution_breakdown)
+                # Show breakdown by attribution
+                print("\n🎯 ATTRIBUTION BREAKDOWN:")
+                print("-" * 30)
+                attribution_breakdown = df_detailed['ATTRIBUTION_SOURCE'].value_counts()
+                print(attribution_breakdown)
             
-        else:
-            print("No detailed data found")
+            else:
+                print("No detailed data found")
         
-        conn.close()
         print("\n✅ Analysis complete!")
         
     except Exception as e:
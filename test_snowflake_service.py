@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for SnowflakeService.execute_queries_async against a stub connection pool
+"""
+
+import unittest
+from unittest import mock
+
+import pandas as pd
+import snowflake.connector
+
+import snowflake_service
+from snowflake_service import SnowflakeService
+
+
+class StubCursor:
+    def __init__(self, conn, query_id):
+        self._conn = conn
+        self.sfqid = query_id
+
+    def execute_async(self, query, params, _statement_params=None):
+        if self._conn.fail_with is not None:
+            raise self._conn.fail_with
+
+    def get_results_from_sfqid(self, query_id):
+        pass
+
+    def fetch_pandas_all(self):
+        return pd.DataFrame({'VALUE': [1]})
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, fail_with=None):
+        self.fail_with = fail_with
+        self._cursors = 0
+
+    def cursor(self):
+        self._cursors += 1
+        return StubCursor(self, f"q{self._cursors}")
+
+    def get_query_status_throw_if_error(self, query_id):
+        return 'SUCCESS'
+
+    def is_still_running(self, status):
+        return False
+
+
+class StubPool:
+    """Records every acquire/release so tests can check the connection went back"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.acquired = 0
+        self.released = []
+
+    def acquire(self):
+        self.acquired += 1
+        return self.conn
+
+    def release(self, conn, discard=False):
+        self.released.append((conn, discard))
+
+
+class ExecuteQueriesAsyncTest(unittest.TestCase):
+
+    def setUp(self):
+        # Keep results out of the process-wide and Redis caches
+        snowflake_service._result_cache.clear()
+        patcher = mock.patch.object(snowflake_service, 'RESULT_CACHE_REDIS_URL', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(snowflake_service._result_cache.clear)
+
+    def test_runs_batch_on_one_pooled_connection(self):
+        pool = StubPool(StubConnection())
+        service = SnowflakeService(pool=pool)
+
+        results = service.execute_queries_async({
+            'a': ("SELECT 1 AS value", None),
+            'b': ("SELECT 2 AS value", None),
+        }, poll_interval=0)
+
+        self.assertEqual(set(results), {'a', 'b'})
+        for df in results.values():
+            self.assertIsInstance(df, pd.DataFrame)
+            self.assertEqual(list(df.columns), ['value'])
+        self.assertEqual(pool.acquired, 1)
+        self.assertEqual(pool.released, [(pool.conn, False)])
+
+    def test_discards_connection_after_session_failure(self):
+        error = snowflake.connector.errors.OperationalError(msg="session gone")
+        pool = StubPool(StubConnection(fail_with=error))
+        service = SnowflakeService(pool=pool)
+
+        results = service.execute_queries_async({'a': ("SELECT 1 AS value", None)}, poll_interval=0)
+
+        self.assertIsInstance(results['a'], Exception)
+        self.assertEqual(pool.released, [(pool.conn, True)])
+
+    def test_cached_batch_skips_the_pool(self):
+        pool = StubPool(StubConnection())
+        service = SnowflakeService(pool=pool)
+        queries = {'a': ("SELECT 1 AS value", None)}
+
+        service.execute_queries_async(queries, poll_interval=0)
+        service.execute_queries_async(queries, poll_interval=0)
+
+        self.assertEqual(pool.acquired, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()